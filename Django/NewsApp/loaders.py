@@ -0,0 +1,125 @@
+import os, json, pickle, threading
+from collections import OrderedDict
+
+
+DATA_DIR = './NewsApp/static/data'
+
+
+class ArtifactCache:
+    """
+    Bounded LRU cache of artifacts loaded from static/data, keyed by month such as (year, month)
+    An entry is loaded again when the modification time of any of its files changes
+    """
+    def __init__(self, load, maxsize=48):
+        self.load = load
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, paths):
+        mtimes = tuple(os.path.getmtime(path) for path in paths)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == mtimes:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = self.load(*paths)
+        with self.lock:
+            self.entries[key] = (mtimes, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize}
+
+
+def load_vocabs(vocabs_path):
+    with open(vocabs_path, 'rb') as f:
+        topn_vocabs = pickle.load(f)
+
+    vocaidx = []
+    for i in range(20):
+        vocaidx.append((topn_vocabs.loc[topn_vocabs['topic'] == i]['vocaidx'].values).tolist())
+    return dict(list(enumerate(vocaidx)))
+
+
+def load_articles(articles_path, titles_path, urls_path):
+    with open(articles_path, 'rb') as f:
+        topn_articles = pickle.load(f)
+
+    with open(titles_path, 'r') as f:
+        titlelist = f.read().split('\n')
+
+    with open(urls_path, 'r') as f:
+        urllist = f.read().split('\n')
+
+    articles = {}
+    for topic, docidx in zip(topn_articles['topic'].values.tolist(), topn_articles['docidx'].values.tolist()):
+        articles.setdefault(topic, []).append((titlelist[docidx], urllist[docidx]))
+    return articles
+
+
+def load_serving(serving_path):
+    with open(serving_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['topics']
+
+
+vocabs_cache = ArtifactCache(load_vocabs)
+articles_cache = ArtifactCache(load_articles)
+serving_cache = ArtifactCache(load_serving)
+
+
+def get_vocabs(year, month):
+    """
+    {topic number:[top words]} of year, month
+    """
+    return vocabs_cache.get((year, month), [os.path.join(DATA_DIR, 'topn_vocabs_' + year + month)])
+
+
+def get_articles(year, month):
+    """
+    {topic number:[(title, url) of top articles]} of year, month
+    """
+    return articles_cache.get((year, month), [os.path.join(DATA_DIR, 'topn_articles_' + year + month),
+                                              os.path.join(DATA_DIR, 'titlelist' + year + month + '.txt'),
+                                              os.path.join(DATA_DIR, 'urllist' + year + month + '.txt')])
+
+
+def artifact_mtime(year, month):
+    """
+    Latest modification time of the files of year, month, or None when they do not exist
+    """
+    paths = [os.path.join(DATA_DIR, 'topn_vocabs_' + year + month),
+             os.path.join(DATA_DIR, 'topn_articles_' + year + month)]
+    mtimes = [os.path.getmtime(path) for path in paths if os.path.exists(path)]
+    return max(mtimes) if mtimes else None
+
+
+def get_topics(category, year, month):
+    """
+    [{'topic', 'words', 'articles':[{'title', 'url'}]}] of category, year, month, or None when there are no artifacts
+    serving_{category}_{yyyymm}.json written by estimate.py is used first, then the pickles of the politics category
+    """
+    serving_path = os.path.join(DATA_DIR, f"serving_{category}_{year}{month:02d}.json")
+    if os.path.exists(serving_path):
+        return serving_cache.get((category, year, month), [serving_path])
+
+    if category != 'politics' or artifact_mtime(str(year), str(month)) is None:
+        return None
+    vocabs = get_vocabs(str(year), str(month))
+    articles = get_articles(str(year), str(month))
+    return [dict(topic=topic, words=words,
+                 articles=[dict(title=title, url=url, alternates=[]) for title, url in articles.get(topic, [])])
+            for topic, words in vocabs.items()]
+
+
+def cache_stats():
+    return {'vocabs': vocabs_cache.stats(), 'articles': articles_cache.stats(), 'serving': serving_cache.stats()}
@@ -0,0 +1,41 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from NewsApp.models import MonthTopic, TopicArticle
+
+
+class Command(BaseCommand):
+    help = 'Load serving_{category}_{yyyymm}.json files written by estimate.py into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Serving artifacts to load')
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            with open(path, 'r', encoding='utf-8') as f:
+                serving = json.load(f)
+            n_articles = load_serving(serving)
+            self.stdout.write(f"{path} : {len(serving['topics'])} topics, {n_articles} articles")
+
+
+@transaction.atomic
+def load_serving(serving):
+    """
+    Replace topics and articles of the month of serving artifact
+    """
+    month = dict(category=serving['category'], year=serving['year'], month=serving['month'])
+    MonthTopic.objects.filter(**month).delete()
+
+    topics = MonthTopic.objects.bulk_create([
+        MonthTopic(topic=topic['topic'], words=json.dumps(topic['words'], ensure_ascii=False), **month)
+        for topic in serving['topics']
+    ])
+    if not all(topic.pk for topic in topics):
+        topics = list(MonthTopic.objects.filter(**month))
+
+    articles = [TopicArticle(topic=row, rank=rank, title=article['title'], url=article['url'],
+                             alternates=json.dumps(article.get('alternates', []), ensure_ascii=False))
+                for row, topic in zip(topics, serving['topics'])
+                for rank, article in enumerate(topic['articles'])]
+    TopicArticle.objects.bulk_create(articles)
+    return len(articles)
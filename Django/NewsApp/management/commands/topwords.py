@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from NewsApp import modelling
+
+
+class Command(BaseCommand):
+    help = 'Fit LDA on a corpus pickle and print the top words of each topic'
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help='Pickled list of word lists')
+        parser.add_argument('-k', '--num-topics', type=int, default=20, help='Number of topics')
+        parser.add_argument('-n', '--topn', type=int, default=5, help='Number of words per topic')
+
+    def handle(self, *args, **options):
+        model, gensim_corpus = modelling.fit_lda(options['corpus'], options['num_topics'])
+        for k, words in enumerate(modelling.top_words(model, gensim_corpus, options['topn']), 1):
+            self.stdout.write(f"{k} : {' '.join(words)}")
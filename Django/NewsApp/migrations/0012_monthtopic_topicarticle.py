@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('NewsApp', '0011_delete_topic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthTopic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(default='politics', max_length=20)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('topic', models.IntegerField()),
+                ('words', models.TextField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['topic'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TopicArticle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.IntegerField()),
+                ('title', models.TextField()),
+                ('url', models.URLField(max_length=500)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='articles', to='NewsApp.monthtopic')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthtopic',
+            constraint=models.UniqueConstraint(fields=('category', 'year', 'month', 'topic'), name='unique_month_topic'),
+        ),
+        migrations.AddIndex(
+            model_name='topicarticle',
+            index=models.Index(fields=['topic', 'rank'], name='NewsApp_top_topic_i_fbe060_idx'),
+        ),
+    ]
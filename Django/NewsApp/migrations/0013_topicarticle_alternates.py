@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('NewsApp', '0012_monthtopic_topicarticle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topicarticle',
+            name='alternates',
+            field=models.TextField(default='[]'),
+        ),
+    ]
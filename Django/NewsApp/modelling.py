@@ -0,0 +1,29 @@
+import pickle
+
+
+# Topic modelling helpers for admin and management commands.
+# gensim is imported inside the functions so that serving requests never load it.
+
+def fit_lda(corpus_path, num_topics=20):
+    from gensim.corpora import Dictionary
+    from gensim.models import LdaModel
+
+    with open(corpus_path, 'rb') as f:
+        corpus = pickle.load(f)
+
+    dictionary = Dictionary(corpus)
+    gensim_corpus = [dictionary.doc2bow(doc) for doc in corpus]
+    model = LdaModel(gensim_corpus, id2word=dictionary, num_topics=num_topics)
+    return model, gensim_corpus
+
+
+def top_words(model, gensim_corpus, topn=5):
+    top_topics = model.top_topics(gensim_corpus, topn=topn)
+    return [[tuples[1] for tuples in pair[0]] for pair in top_topics]
+
+
+def load_model(name):
+    from gensim.models import LdaModel
+    from gensim.test.utils import datapath
+
+    return LdaModel.load(datapath(name))
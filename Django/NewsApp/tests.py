@@ -1,3 +1,122 @@
-from django.test import TestCase
+import os, json, tempfile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from NewsApp.management.commands.loadserving import load_serving
+from NewsApp.loaders import ArtifactCache
 
-# Create your tests here.
+
+def serving(category, year, month, n_topics=3):
+    return dict(category=category, year=year, month=month,
+                topics=[dict(topic=topic, words=[f"단어{topic}_{i}" for i in range(5)],
+                             articles=[dict(title=f"기사 {topic}-{rank}", url=f"https://v.daum.net/v/{topic}{rank}")
+                                       for rank in range(3)])
+                        for topic in range(n_topics)])
+
+
+class ApiTopicsTests(TestCase):
+
+    def setUp(self):
+        for month in range(1, 4):
+            load_serving(serving('politics', 2020, month))
+
+    def test_pages(self):
+        response = self.client.get(reverse('api_topics'), {'months': '2020-01:2020-03', 'page_size': 2})
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((body['count'], body['num_pages']), (3, 2))
+        self.assertEqual([result['month'] for result in body['results']], [1, 2])
+        body = json.loads(b''.join(self.client.get(body['next']).streaming_content))
+        self.assertEqual([result['month'] for result in body['results']], [3])
+        self.assertIsNone(body['next'])
+
+    def test_fields(self):
+        response = self.client.get(reverse('api_topics'), {'months': '2020-01', 'fields': 'topic,words', 'words': 2})
+        topics = json.loads(b''.join(response.streaming_content))['results'][0]['topics']
+        self.assertEqual(topics[1], dict(topic=1, words=['단어1_0', '단어1_1']))
+
+    def test_missing_month(self):
+        response = self.client.get(reverse('api_topics'), {'months': '2020-04', 'categories': 'politics,economic'})
+        results = json.loads(b''.join(response.streaming_content))['results']
+        self.assertEqual([result['topics'] for result in results], [None, None])
+
+    def test_invalid_parameters(self):
+        for query in [{}, {'months': '2020-13'}, {'months': '2020-03:2020-01'}, {'months': '2020-01', 'fields': 'body'},
+                      {'months': '2020-01', 'categories': 'politcs'}, {'months': '2020-01', 'page': 0}]:
+            self.assertEqual(self.client.get(reverse('api_topics'), query).status_code, 400, query)
+
+
+class MonthViewTests(TestCase):
+
+    def setUp(self):
+        load_serving(serving('politics', 2020, 8))
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse('news', kwargs=dict(year=2020, month=8)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=300', response['Cache-Control'])
+        again = self.client.get(reverse('news', kwargs=dict(year=2020, month=8)), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        load_serving(serving('politics', 2020, 8, n_topics=4))
+        changed = self.client.get(reverse('news', kwargs=dict(year=2020, month=8)), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_month_redirect(self):
+        response = self.client.get(reverse('news2020'), {'month': '8'})
+        self.assertRedirects(response, reverse('news', kwargs=dict(year=2020, month=8)), fetch_redirect_response=False)
+        for month in ['abc', '13', '0', '-1']:
+            self.assertEqual(self.client.get(reverse('news2020'), {'month': month}).status_code, 404, month)
+
+    def test_articles(self):
+        response = self.client.get(reverse('articles', kwargs=dict(year=2020, month=8, topic=3)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([title for title, _, _ in response.context['data']], ['기사 2-0', '기사 2-1', '기사 2-2'])
+        for topic in [0, 4]:
+            self.assertEqual(self.client.get(reverse('articles', kwargs=dict(year=2020, month=8, topic=topic))).status_code,
+                             404, topic)
+        self.assertEqual(self.client.get(reverse('articles', kwargs=dict(year=2020, month=9, topic=1))).status_code, 404)
+
+
+class ArtifactCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tempdir.name, f"artifact{i}.txt")
+            with open(path, 'w') as f:
+                f.write(f"version 1 of {i}")
+            self.paths.append(path)
+        self.loads = []
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def load(self, path):
+        self.loads.append(path)
+        with open(path, 'r') as f:
+            return f.read()
+
+    def test_hits(self):
+        cache = ArtifactCache(self.load)
+        for _ in range(3):
+            self.assertEqual(cache.get(0, self.paths[:1]), 'version 1 of 0')
+        self.assertEqual(self.loads, self.paths[:1])
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 48})
+
+    def test_reload_on_change(self):
+        cache = ArtifactCache(self.load)
+        cache.get(0, self.paths[:1])
+        with open(self.paths[0], 'w') as f:
+            f.write('version 2 of 0')
+        mtime = os.path.getmtime(self.paths[0])
+        os.utime(self.paths[0], (mtime + 1, mtime + 1))
+        self.assertEqual(cache.get(0, self.paths[:1]), 'version 2 of 0')
+        self.assertEqual(len(self.loads), 2)
+
+    def test_maxsize(self):
+        cache = ArtifactCache(self.load, maxsize=2)
+        for i in [0, 1, 0, 2]:
+            cache.get(i, [self.paths[i]])
+        self.assertEqual(list(cache.entries), [0, 2])
+        cache.get(1, [self.paths[1]])
+        self.assertEqual(self.loads, [self.paths[0], self.paths[1], self.paths[2], self.paths[1]])
+        self.assertEqual(cache.stats()['size'], 2)
@@ -3,10 +3,12 @@ from.import views
 
 urlpatterns = [
     path('index/', views.index, name='index'),
-    path('news2020/', views.news2020, name='news2020'),
-    path('news2019/', views.news2019, name='news2019'),
-    path('news2018/', views.news2018, name='news2018'),
-    path('news2017/', views.news2017, name='news2017'),
-    path('articles/', views.articles, name='articles'),
-    path('articles/<article_id>/', views.articles),
+    path('news2020/', views.news_year, {'year': 2020}, name='news2020'),
+    path('news2019/', views.news_year, {'year': 2019}, name='news2019'),
+    path('news2018/', views.news_year, {'year': 2018}, name='news2018'),
+    path('news2017/', views.news_year, {'year': 2017}, name='news2017'),
+    path('news/<int:year>/<int:month>/', views.news, name='news'),
+    path('articles/<int:year>/<int:month>/<int:topic>/', views.articles, name='articles'),
+    path('api/topics/', views.api_topics, name='api_topics'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
 ]
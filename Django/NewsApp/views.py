@@ -1,109 +1,164 @@
-from django.shortcuts import render
-from django.http import HttpResponse
-import pickle
+from django.shortcuts import render, redirect
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.db.models import Max
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
+from . import loaders
+from .models import MonthTopic, TopicArticle
+import datetime, json
+
+YEARS = [2020, 2019, 2018, 2017]
+CATEGORIES = ['politics', 'society', 'economic', 'culture', 'entertain', 'digital', 'editorial']
+API_FIELDS = ['topic', 'words', 'articles']
+API_PAGE_SIZE = 12
+API_MAX_PAGE_SIZE = 120
+API_MAX_MONTHS = 120
 
 def index(request):
     return render(request,'index.html')
 
-def get_vocabs(topn_vocabs):
-    vocaidx = []
-    for i in range(20):
-        vocaidx.append((topn_vocabs.loc[topn_vocabs['topic'] == i]['vocaidx'].values).tolist())
-    vocaidx = dict(list(enumerate(vocaidx)))
-    return vocaidx
-
-def news2020(request):
-    contents = {}
-    global year
-    global month
-    year = '2020'
-    month = request.GET.get('month', '')
-    if month:
-        contents['month'] = month
-
-        link = './NewsApp/static/data/topn_vocabs_' + year + month
-        with open(link, 'rb') as f:
-            topn_vocabs = pickle.load(f)
-
-        contents['data'] = get_vocabs(topn_vocabs)
-
-    return render(request,'news2020.html', contents)
-
-def news2019(request):
-    contents = {}
-    global year
-    global month
-    year = '2019'
+def get_vocabs(year, month, category='politics'):
+    topics = MonthTopic.objects.filter(category=category, year=year, month=month)
+    vocaidx = {topic.topic: topic.word_list() for topic in topics}
+    return vocaidx or loaders.get_vocabs(str(year), str(month))
+
+def get_articles(year, month, topic, category='politics'):
+    articles = TopicArticle.objects.filter(topic__category=category, topic__year=year,
+                                           topic__month=month, topic__topic=topic)
+    title_url = [(article.title, article.url, article.alternate_list()) for article in articles]
+    return title_url or [(title, url, []) for title, url in loaders.get_articles(str(year), str(month)).get(topic, [])]
+
+def last_modified(request, year, month, topic=None, category='politics'):
+    # Version of the artifacts of a month : latest load into the database, or modification time of static/data files
+    updated = MonthTopic.objects.filter(category=category, year=year, month=month).aggregate(Max('updated'))['updated__max']
+    if updated:
+        return updated
+    mtime = loaders.artifact_mtime(str(year), str(month))
+    if mtime:
+        return datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+    return None
+
+def etag(request, year, month, topic=None, category='politics'):
+    modified = last_modified(request, year, month, topic, category)
+    if modified is None:
+        return None
+    return f"{category}-{year}-{month}-{topic or 0}-{modified.timestamp():.6f}"
+
+def news_year(request, year):
+    # Landing page of a year, redirecting ?month= requests to the news page of the month
     month = request.GET.get('month', '')
     if month:
-        contents['month'] = month
-
-        link = './NewsApp/static/data/topn_vocabs_' + year + month
-        with open(link, 'rb') as f:
-            topn_vocabs = pickle.load(f)
-
-        contents['data'] = get_vocabs(topn_vocabs)
-    return render(request,'news2019.html', contents)
-
-def news2018(request):
-    contents = {}
-    global year
-    global month
-    year = '2018'
-    month = request.GET.get('month', '')
-    if month:
-        contents['month'] = month
-
-        link = './NewsApp/static/data/topn_vocabs_' + year + month
-        with open(link, 'rb') as f:
-            topn_vocabs = pickle.load(f)
-
-        contents['data'] = get_vocabs(topn_vocabs)
-    return render(request,'news2018.html', contents)
-
-def news2017(request):
+        if not (month.isdigit() and 1 <= int(month) <= 12):
+            raise Http404
+        return redirect('news', year=year, month=int(month))
+    return render(request, f'news{year}.html', {'year': year})
+
+@cache_control(public=True, max_age=300)
+@condition(etag_func=etag, last_modified_func=last_modified)
+def news(request, year, month):
+    if year not in YEARS:
+        raise Http404
     contents = {}
-    global year
-    global month
-    year = '2017'
-    month = request.GET.get('month', '')
-    if month:
-        contents['month'] = month
-
-        link = './NewsApp/static/data/topn_vocabs_' + year + month
-        with open(link, 'rb') as f:
-            topn_vocabs = pickle.load(f)
-
-        contents['data'] = get_vocabs(topn_vocabs)
-    return render(request,'news2017.html', contents)
-
-def articles(request, article_id):
+    contents['year'] = year
+    contents['month'] = month
+    try:
+        contents['data'] = get_vocabs(year, month)
+    except FileNotFoundError:
+        raise Http404
+    return render(request, f'news{year}.html', contents)
+
+@cache_control(public=True, max_age=300)
+@condition(etag_func=etag, last_modified_func=last_modified)
+def articles(request, year, month, topic):
     contents = {}
-    contents['id'] = article_id
+    contents['id'] = topic
     contents['year'] = year
     contents['month'] = month
-
-    article_id = int(article_id) - 1
-
-    link2 = './NewsApp/static/data/topn_articles_' + year + month
-    with open(link2, 'rb') as f:
-        topn_articles = pickle.load(f)
-
-    docidx = (topn_articles.loc[topn_articles['topic'] == article_id]['docidx'].values).tolist()
-
-    link3 = './NewsApp/static/data/titlelist' + year + month + '.txt'
-    with open(link3, 'r') as f:
-        titlelist = f.read().split('\n')
-
-    link4 = './NewsApp/static/data/urllist' + year + month + '.txt'
-    with open(link4, 'r') as f:
-        urllist = f.read().split('\n')
-
-    title_list = [titlelist[i] for i in docidx]
-    url_list = [urllist[i] for i in docidx]
-
-    dictionary = dict(zip(title_list, url_list))
-
-    contents['data'] = dictionary
-
-    return render(request, 'articles.html', contents)
\ No newline at end of file
+    try:
+        if not 1 <= topic <= len(get_vocabs(year, month)):
+            raise Http404
+        contents['data'] = get_articles(year, month, topic - 1)
+    except FileNotFoundError:
+        raise Http404
+    return render(request, 'articles.html', contents)
+
+def parse_months(value):
+    # '2020-01,2020-03' or a range '2020-01:2020-12' -> [(2020, 1), (2020, 3)]
+    months = []
+    for part in filter(None, value.split(',')):
+        start, _, end = part.partition(':')
+        start = datetime.date(*map(int, start.split('-')), 1)
+        end = datetime.date(*map(int, end.split('-')), 1) if end else start
+        if end < start or (end.year - start.year) * 12 + end.month - start.month >= API_MAX_MONTHS:
+            raise ValueError(part)
+        while start <= end:
+            months.append((start.year, start.month))
+            start = (start + datetime.timedelta(days=31)).replace(day=1)
+    return months
+
+def month_topics(category, year, month):
+    # Topics of a month from the database, or from the artifacts in static/data
+    topics = MonthTopic.objects.filter(category=category, year=year, month=month).prefetch_related('articles')
+    topics = [dict(topic=topic.topic, words=topic.word_list(),
+                   articles=[dict(title=article.title, url=article.url, alternates=article.alternate_list())
+                             for article in topic.articles.all()])
+              for topic in topics]
+    return topics or loaders.get_topics(category, year, month)
+
+def select(topic, fields, n_words, n_articles):
+    topic = {field: topic[field] for field in fields}
+    if n_words is not None and 'words' in topic:
+        topic['words'] = topic['words'][:n_words]
+    if n_articles is not None and 'articles' in topic:
+        topic['articles'] = topic['articles'][:n_articles]
+    return topic
+
+def api_topics(request):
+    """
+    Topics, top words and top articles of many months and categories in one response
+    GET parameters : months=2020-01:2020-12,2019-05  categories=politics,economic  fields=topic,words,articles
+                     words=10  articles=5  page=1  page_size=12
+    Results are paged by (category, month) and streamed one month at a time
+    """
+    try:
+        months = parse_months(request.GET.get('months', ''))
+        categories = [category for category in request.GET.get('categories', 'politics').split(',') if category]
+        fields = [field for field in request.GET.get('fields', ','.join(API_FIELDS)).split(',') if field]
+        n_words = int(request.GET['words']) if 'words' in request.GET else None
+        n_articles = int(request.GET['articles']) if 'articles' in request.GET else None
+        page = int(request.GET.get('page', 1))
+        page_size = min(int(request.GET.get('page_size', API_PAGE_SIZE)), API_MAX_PAGE_SIZE)
+    except (ValueError, TypeError) as error:
+        return JsonResponse({'error': f'Invalid parameter : {error}'}, status=400)
+    if not months:
+        return JsonResponse({'error': 'months is required, e.g. months=2020-01:2020-12'}, status=400)
+    if not categories or set(categories) - set(CATEGORIES):
+        return JsonResponse({'error': f'categories must be among {CATEGORIES}'}, status=400)
+    if set(fields) - set(API_FIELDS):
+        return JsonResponse({'error': f'fields must be among {API_FIELDS}'}, status=400)
+    if page < 1 or page_size < 1:
+        return JsonResponse({'error': 'page and page_size must be positive'}, status=400)
+
+    keys = [(category, year, month) for category in categories for year, month in months]
+    n_pages = max(1, -(-len(keys) // page_size))
+    next_page = None
+    if page < n_pages:
+        query = request.GET.copy()
+        query['page'] = page + 1
+        next_page = request.path + '?' + query.urlencode()
+
+    def stream():
+        head = dict(count=len(keys), page=page, num_pages=n_pages, next=next_page)
+        yield json.dumps(head, ensure_ascii=False)[:-1] + ', "results": ['
+        for i, (category, year, month) in enumerate(keys[(page - 1) * page_size:page * page_size]):
+            topics = month_topics(category, year, month)
+            if topics is not None:
+                topics = [select(topic, fields, n_words, n_articles) for topic in topics]
+            result = dict(category=category, year=year, month=month, topics=topics)
+            yield (', ' if i else '') + json.dumps(result, ensure_ascii=False)
+        yield ']}'
+
+    return StreamingHttpResponse(stream(), content_type='application/json; charset=utf-8')
+
+def cache_stats(request):
+    return JsonResponse(loaders.cache_stats())
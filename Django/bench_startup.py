@@ -0,0 +1,52 @@
+import os, sys, json, argparse, subprocess
+
+
+"""
+Benchmark of web worker startup : time and peak RSS to set up Django and import NewsApp,
+compared with also importing the modelling stack(gensim, pandas) as models.py used to
+encoding : UTF-8
+"""
+
+
+CHILD = """
+import os, sys, time, json, resource
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NewsWeb.settings')
+import django
+django.setup()
+import NewsApp.models, NewsApp.views, NewsWeb.urls
+for name in sys.argv[1:]:
+    __import__(name)
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def measure(extra_modules, repeat):
+    """
+    Median seconds and peak RSS(MB) of `repeat` fresh interpreters importing the app and extra_modules
+    """
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', CHILD] + extra_modules, check=True,
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        results.append(json.loads(output.stdout.strip().split('\n')[-1]))
+    results.sort(key=lambda result: result['seconds'])
+    return results[len(results) // 2]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark import time and memory of a web worker')
+    parser.add_argument('-n', '--repeat', type=int, default=5, metavar='', help='Number of fresh interpreters per case')
+    args = parser.parse_args()
+
+    cases = [('serving path', []),
+             ('with modelling stack', ['gensim.corpora', 'gensim.models.ldamulticore', 'pandas'])]
+    for label, modules in cases:
+        try:
+            result = measure(modules, args.repeat)
+        except subprocess.CalledProcessError as error:
+            print(f"{label.ljust(22)} : failed\n{error.stderr}")
+            continue
+        print(f"{label.ljust(22)} : {result['seconds']*1000:7.1f} ms, {result['rss_mb']:6.1f} MB")
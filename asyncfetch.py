@@ -0,0 +1,197 @@
+import asyncio, time, codecs
+from collections import defaultdict
+from urllib.parse import urlsplit
+import aiohttp
+import metrics
+from daum import pageurl_template, rewrite_host, parse_listing, search_pages, merge_pages
+from httpcache import conditional_headers
+from fetchpolicy import FetchPolicy, FetchError, parse_retry_after
+
+
+"""
+Asyncio fetch engine : one keep-alive connection pool, bounded in-flight requests, per-host rate limit
+encoding : UTF-8
+"""
+
+
+class TokenBucket:
+    """
+    Token bucket that allows `rate` requests per second on average with bursts of up to `capacity`
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncFetcher:
+    """
+    aiohttp client shared by every request of a run
+    max_inflight bounds concurrent requests, host_rate bounds requests per second for each host
+    base_url redirects every request to another host, e.g. a local stand-in serving recorded pages
+    cache is an optional httpcache.ResponseCache
+    policy is the fetchpolicy.FetchPolicy of timeouts and retries
+    """
+    def __init__(self, max_inflight=200, host_rate=20.0, base_url=None, cache=None, policy=None):
+        self.max_inflight = max_inflight
+        self.host_rate = host_rate
+        self.base_url = base_url
+        self.policy = policy or FetchPolicy()
+        self.cache = cache
+        self.buckets = defaultdict(lambda: TokenBucket(self.host_rate))
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_inflight, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(sock_connect=self.policy.connect_timeout,
+                                                                           sock_read=self.policy.read_timeout))
+        self.semaphore = asyncio.Semaphore(self.max_inflight)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def get(self, url):
+        """
+        GET url and return decoded body text, retrying as the policy allows
+        Raise fetchpolicy.FetchError when every attempt failed or the page is answered with another error status
+        """
+        url = rewrite_host(url, self.base_url)
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and self.cache.reusable(url):
+            metrics.count('cache_hits')
+            return entry['body']
+
+        for attempt in range(self.policy.retries + 1):
+            if self.host_rate:
+                await self.buckets[urlsplit(url).netloc].acquire()
+            retry_after = None
+            async with self.semaphore:
+                started = time.perf_counter()
+                try:
+                    async with self.session.get(url, headers=conditional_headers(entry)) as response:
+                        status = response.status
+                        if entry and status == 304:
+                            metrics.observe('fetch', time.perf_counter() - started)
+                            metrics.count('cache_hits')
+                            return entry['body']
+                        if response.status < 400:
+                            body = await response.read()
+                            text = body.decode(encoding(response), errors='replace')
+                            metrics.observe('fetch', time.perf_counter() - started, len(body))
+                            break
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    metrics.error('fetch')
+                    reason = type(error).__name__
+                else:
+                    metrics.error('fetch')
+                    reason = f"HTTP {status}"
+                    if not self.policy.retryable(status):
+                        raise FetchError(url, reason)
+            if attempt == self.policy.retries:
+                raise FetchError(url, f"{reason} after {attempt + 1} attempts")
+            metrics.retry('fetch')
+            await asyncio.sleep(self.policy.delay(attempt, retry_after))
+
+        if self.cache:
+            self.cache.store(url, text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return text
+
+
+def encoding(response):
+    """
+    Charset of response, UTF-8 when it is missing or unknown to Python
+    """
+    try:
+        return codecs.lookup(response.get_encoding()).name
+    except (LookupError, RuntimeError):
+        return 'utf-8'
+
+
+async def get_url_title(fetcher, category, date, probes=None):
+    """
+    Get list of valid URL of articles and their title that corresponds to certain input date
+    With probes, the number of pages is searched with up to `probes` concurrent requests per round(daum.search_pages)
+    and the rest of the pages are fetched concurrently, instead of walking pages one by one
+    """
+    if probes:
+        pages = {}
+        async def load(pagenum):
+            return parse_listing(await fetcher.get(pageurl_template(category, pagenum, date)))
+        def fetch(pagenum):
+            if pagenum not in pages:
+                pages[pagenum] = asyncio.ensure_future(load(pagenum))
+            return pages[pagenum]
+
+        search = search_pages(probes)
+        pagenums = next(search)
+        while True:
+            found = await asyncio.gather(*[fetch(pagenum) for pagenum in pagenums])
+            try:
+                pagenums = search.send([page['last'] for page in found])
+            except StopIteration as stop:
+                n_pages = stop.value
+                break
+        found = await asyncio.gather(*[fetch(pagenum) for pagenum in range(1, n_pages + 1)])
+        return merge_pages(dict(enumerate(found, 1)), n_pages)
+
+    pagenum = 1
+    url_title = dict({'urls':[], 'titles':[]})
+
+    while True:
+        page = parse_listing(await fetcher.get(pageurl_template(category, pagenum, date)))
+        if page['last']:
+            break
+        url_title['urls'] += page['urls']
+        url_title['titles'] += page['titles']
+        pagenum += 1
+
+    return url_title
+
+
+async def get_url_titles(category, datelist, probes=None, **fetcher_options):
+    """
+    Scrape listing pages of every date concurrently, returning url_title dicts in the order of datelist
+    The dict of a day whose listing could not be scraped is empty and has the reason in 'failed'
+    """
+    async with AsyncFetcher(**fetcher_options) as fetcher:
+        async def listing(date):
+            try:
+                return await get_url_title(fetcher, category, date, probes)
+            except Exception as error:
+                return dict(urls=[], titles=[], failed=f"{type(error).__name__}: {error}")
+        return await asyncio.gather(*[listing(date) for date in datelist])
+
+
+async def fetch_pages(urllist, callback, **fetcher_options):
+    """
+    Download every URL in urllist concurrently and call callback(idx, html) as each page arrives,
+    or callback(idx, None, reason) for pages that could not be fetched or decoded, so that one bad page does not
+    stop the others
+    """
+    async with AsyncFetcher(**fetcher_options) as fetcher:
+        async def fetch(idx, url):
+            try:
+                html = await fetcher.get(url)
+            except FetchError as error:
+                callback(idx, None, str(error))
+            except Exception as error:
+                callback(idx, None, f"{type(error).__name__}: {error}")
+            else:
+                callback(idx, html)
+        await asyncio.gather(*[fetch(idx, url) for idx, url in enumerate(urllist)])
@@ -0,0 +1,119 @@
+import os, sys, json, time, shlex, argparse, calendar, ray
+from tokenizer import start_tokenizers
+
+
+"""
+Batch driver building corpora and LDA results for every category and month of a matrix on one Ray cluster
+Crawls of different months run concurrently on shared Mecab actors, and the LDA fit of a month starts as soon as
+its corpus is ready, overlapping with the crawls that are still running
+encoding : UTF-8
+"""
+
+
+CATEGORIES = ['politics', 'society', 'economic', 'culture', 'entertain', 'digital', 'editorial']
+
+
+parser = argparse.ArgumentParser(description='Crawl and estimate every category and month of a matrix in one run')
+parser.add_argument('-c', '--categories', nargs='+', choices=CATEGORIES, default=CATEGORIES, metavar='',
+                    help='Categories of articles. Defaults to all seven')
+parser.add_argument('-s', '--start-month', required=True, metavar='', help='First month in yyyymm format')
+parser.add_argument('-e', '--end-month', required=True, metavar='', help='Last month in yyyymm format')
+parser.add_argument('-k', '--num-topics', type=int, default=20, metavar='', help='Number of topics')
+parser.add_argument('-na', '--top-na', type=int, default=20, metavar='', help='Number of articles to be presented for each topic')
+parser.add_argument('-nv', '--top-nv', type=int, default=20, metavar='', help='Number of vocabularies to be presented for each topic')
+parser.add_argument('--parallel', type=int, default=4, metavar='', help='Number of corpora crawled at the same time')
+parser.add_argument('--estimate-cpus', type=int, default=2, metavar='', help='CPUs reserved for each LDA fit')
+parser.add_argument('--tokenize-workers', type=int, metavar='', help='Number of Mecab actors shared by every crawl')
+parser.add_argument('--crawl-args', default='', metavar='',
+                    help="Extra arguments of getcorpus.py for every crawl, e.g. \"--cache ./cache --engine async\"")
+parser.add_argument('--estimate-args', default='', metavar='', help='Extra arguments of estimate.py for every fit')
+parser.add_argument('--skip-estimate', action='store_true', help='Only build the corpora')
+parser.add_argument('--address', metavar='', help='Address of a running Ray cluster to join instead of starting one')
+
+
+def month_range(start, end):
+    """
+    [(yyyymm, first day, last day)] of every month from start to end(yyyymm), days in yyyymmdd format
+    """
+    months = []
+    year, month = int(start[:4]), int(start[4:])
+    while (year, month) <= (int(end[:4]), int(end[4:])):
+        last = calendar.monthrange(year, month)[1]
+        months.append((f"{year}{month:02d}", f"{year}{month:02d}01", f"{year}{month:02d}{last}"))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    assert months, 'start month must precede end month'
+    return months
+
+
+@ray.remote(num_cpus=0)
+def crawl(cwd, argv, actors):
+    """
+    getcorpus.py in a Ray worker. It takes no CPU of its own, as it only submits fetch tasks and waits for them
+    """
+    os.chdir(cwd)
+    import getcorpus
+    return getcorpus.main(argv, actors)
+
+
+@ray.remote
+def fit(cwd, argv, crawled):
+    """
+    estimate.py in a Ray worker, scheduled once `crawled`, the result of crawl, is ready
+    """
+    os.chdir(cwd)
+    import estimate
+    return estimate.main(argv)
+
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+    crawl_argv = shlex.split(args.crawl_args)
+    assert not {arg.split('=')[0] for arg in crawl_argv} & {'--memo', '--memo-path'}, \
+        '--memo and --memo-path of getcorpus.py are not supported, as every crawl shares the Mecab actors'
+    cwd = os.getcwd()
+    time_started = time.time()
+    if args.address:
+        ray.init(address=args.address)
+    else:
+        ray.init()
+    actors = start_tokenizers(args.tokenize_workers)
+
+    matrix = [(category, *month) for category in args.categories
+              for month in month_range(args.start_month, args.end_month)]
+    print(f"\nBuilding {len(matrix)} corpora : {len(args.categories)} categories x "
+          f"{len(matrix) // len(args.categories)} months, {args.parallel} crawls at a time")
+
+    results = {}
+    crawls = {}
+    fits = {}
+    waiting = list(matrix)
+    while waiting or crawls or fits:
+        while waiting and len(crawls) < args.parallel:
+            category, yyyymm, first, last = waiting.pop(0)
+            crawl_ref = crawl.remote(cwd, ['y', '-c', category, '-s', first, '-e', last] + crawl_argv, actors)
+            crawls[crawl_ref] = (category, yyyymm)
+            if not args.skip_estimate:
+                argv = ['y', '-c', category, '-s', first, '-e', last, '-k', str(args.num_topics),
+                        '-na', str(args.top_na), '-nv', str(args.top_nv), '-w', str(max(1, args.estimate_cpus - 1))]
+                fit_ref = fit.options(num_cpus=args.estimate_cpus).remote(cwd, argv + shlex.split(args.estimate_args), crawl_ref)
+                fits[fit_ref] = (category, yyyymm)
+
+        done, _ = ray.wait(list(crawls) + list(fits), num_returns=1)
+        for ref in done:
+            stage, key = ('crawl', crawls.pop(ref)) if ref in crawls else ('estimate', fits.pop(ref))
+            try:
+                results.setdefault(f"{key[0]}-{key[1]}", {})[stage] = ray.get(ref)
+                print(f">>> {key[0]} {key[1]} : {stage} finished after {time.time() - time_started:.0f}s")
+            except Exception as error:
+                results.setdefault(f"{key[0]}-{key[1]}", {})[stage] = dict(error=str(error).split('\n')[0])
+                print(f">>> {key[0]} {key[1]} : {stage} failed, {str(error).splitlines()[0]}")
+
+    os.makedirs('./dirs', exist_ok=True)
+    report_path = os.path.join('./dirs', 'batch_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(dict(args=vars(args), elapsed=time.time() - time_started, results=results), f, indent=2)
+    n_failed = sum(isinstance(result, dict) and 'error' in result for stages in results.values() for result in stages.values())
+    minutes, seconds = list(map(int, divmod(time.time() - time_started, 60)))
+    print(f">>> {len(matrix)} corpora in {minutes}m {seconds}s, {n_failed} failed stages, see {report_path}")
+    sys.exit(1 if n_failed else 0)
@@ -0,0 +1,81 @@
+import os, sys, time, argparse
+from urllib.parse import unquote
+import daum
+
+
+"""
+Micro-benchmark of HTML extractor backends of daum.py on pages recorded by daum_standin.py,
+checking that every backend gives the same output as bs4
+encoding : UTF-8
+"""
+
+
+def load_pages(record_dir):
+    """
+    {'listing':[(name, html)], 'article':[(name, html)]} of recorded pages
+    """
+    pages = {'listing': [], 'article': []}
+    for name in sorted(os.listdir(record_dir)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(record_dir, name), 'r', encoding='utf-8') as f:
+            html = f.read()
+        kind = 'listing' if unquote(name).startswith('/breakingnews/') else 'article'
+        pages[kind].append((unquote(name)[:-len('.html')], html))
+    return pages
+
+
+def run(parse, pages):
+    """
+    Outputs of parse, or the exception it raised, on each page
+    """
+    outputs = []
+    for _, html in pages:
+        try:
+            outputs.append(parse(html))
+        except Exception as error:
+            outputs.append(type(error).__name__)
+    return outputs
+
+
+def seconds_per_page(parse, pages, repeat):
+    """
+    Best of repeat passes over pages, divided by the number of pages
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(parse, pages)
+        best = min(best, time.perf_counter() - started)
+    return best / len(pages)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare throughput of HTML extractor backends on recorded pages')
+    parser.add_argument('record_dir', help='Directory of pages recorded by daum_standin.py -r')
+    parser.add_argument('-n', '--repeat', type=int, default=5, metavar='', help='Number of passes over the pages per backend')
+    args = parser.parse_args()
+
+    pages = load_pages(args.record_dir)
+    backends = [name for name in daum.EXTRACTORS if name != 'lxml' or daum.lxml]
+    mismatched = False
+
+    for kind, index in [('listing', 0), ('article', 1)]:
+        if not pages[kind]:
+            print(f"{kind.ljust(8)} : no recorded pages")
+            continue
+        expected = run(daum.EXTRACTORS['bs4'][index], pages[kind])
+        baseline = None
+        for name in backends:
+            parse = daum.EXTRACTORS[name][index]
+            for (page, _), output, reference in zip(pages[kind], run(parse, pages[kind]), expected):
+                if output != reference:
+                    mismatched = True
+                    print(f"{kind.ljust(8)} : {name} differs from bs4 on {page}")
+            elapsed = seconds_per_page(parse, pages[kind], args.repeat)
+            baseline = baseline or elapsed
+            print(f"{kind.ljust(8)} : {name.ljust(5)} {elapsed * 1000:8.3f} ms/page, {1 / elapsed:9.1f} pages/s, "
+                  f"x{baseline / elapsed:.1f} ({len(pages[kind])} pages)")
+
+    sys.exit(1 if mismatched else 0)
@@ -0,0 +1,90 @@
+import os, shutil, copy
+from array import array
+from collections import Counter
+import numpy as np
+
+
+"""
+Integer-encoded bag-of-words corpus shared by getcorpus and estimate
+encoding : UTF-8
+"""
+
+
+def build_bow(records, dirname):
+    """
+    Write documents given as (index in urllist, nouns) pairs into CSR-style arrays under dirname
+        vocab.txt   : one word per line, word id is the line number
+        indptr.npy  : document i spans indices[indptr[i]:indptr[i+1]]
+        indices.npy : word ids of each document
+        counts.npy  : count of each word id
+        docids.npy  : index in urllist.txt of each document
+    Word ids are assigned in order of first appearance, so ids stay the same as shards grow
+    """
+    token2id = {}
+    indptr, indices, counts, docids = array('q', [0]), array('i'), array('i'), array('q')
+    for idx, nouns in records:
+        bow = sorted(Counter(token2id.setdefault(word, len(token2id)) for word in nouns).items())
+        indices.extend(wordid for wordid, _ in bow)
+        counts.extend(count for _, count in bow)
+        indptr.append(len(indices))
+        docids.append(idx)
+
+    temp = dirname + '.tmp'
+    if os.path.exists(temp):
+        shutil.rmtree(temp)
+    os.mkdir(temp)
+    with open(os.path.join(temp, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        for word in token2id:
+            f.write(word + '\n')
+    for name, values in [('indptr', indptr), ('indices', indices), ('counts', counts), ('docids', docids)]:
+        np.save(os.path.join(temp, f"{name}.npy"), np.frombuffer(values, dtype=values.typecode))
+    if os.path.exists(dirname):
+        shutil.rmtree(dirname)
+    os.replace(temp, dirname)
+    return len(docids)
+
+
+def load_vocab(dirname):
+    with open(os.path.join(dirname, 'vocab.txt'), 'r', encoding='utf-8') as f:
+        return f.read().split('\n')[:-1]
+
+
+class MmapCorpus:
+    """
+    Memory-mapped corpus written by build_bow, streamed to gensim as lists of (word id, count)
+    """
+    def __init__(self, dirname):
+        self.dirname = dirname
+        self.indptr = np.load(os.path.join(dirname, 'indptr.npy'), mmap_mode='r')
+        self.indices = np.load(os.path.join(dirname, 'indices.npy'), mmap_mode='r')
+        self.counts = np.load(os.path.join(dirname, 'counts.npy'), mmap_mode='r')
+        self.docids = np.load(os.path.join(dirname, 'docids.npy'), mmap_mode='r')
+        self.id2word = dict(enumerate(load_vocab(dirname)))
+        self.positions = np.arange(len(self.indptr) - 1)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        position = self.positions[i]
+        start, end = self.indptr[position], self.indptr[position+1]
+        return list(zip(self.indices[start:end].tolist(), self.counts[start:end].tolist()))
+
+    def subset(self, positions):
+        """
+        Corpus of documents at positions of this corpus, sharing the memory-mapped arrays
+        """
+        view = copy.copy(self)
+        view.positions = self.positions[positions]
+        view.docids = self.docids[positions]
+        return view
+
+    def slice(self, start, end=None):
+        """
+        Corpus of documents start to end(exclusive)
+        """
+        return self.subset(slice(start, end))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
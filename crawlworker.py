@@ -0,0 +1,116 @@
+import os, time, socket, argparse
+import multiprocessing as mp
+import requests
+from daum import pageurl_template, rewrite_host, parse_listing, parse_article, nouns_from_text, set_extractor, scrape_day
+import httpcache, metrics, fetchpolicy
+
+
+"""
+Crawl worker leasing listing and article tasks from a frontier(frontier.py), possibly on another host
+Start as many as the hosts allow, e.g. one per core on every node of a Ray cluster
+encoding : UTF-8
+"""
+
+
+class FrontierClient:
+    """
+    Calls to the frontier on behalf of one worker, retried while the frontier is unreachable(e.g. restarting),
+    times out or answers with an error status
+    """
+    def __init__(self, frontier_url, worker, retries=30):
+        self.frontier_url = frontier_url.rstrip('/')
+        self.worker = worker
+        self.retries = retries
+        self.session = requests.Session()
+
+    def call(self, method, **request):
+        for attempt in range(self.retries):
+            try:
+                response = self.session.post(f"{self.frontier_url}/{method}", json=dict(request, worker=self.worker), timeout=60)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException:
+                if attempt == self.retries - 1:
+                    raise
+                time.sleep(1.0)
+
+
+def run_task(task, mecab, base_url=None, cache=None, probes=8, policy=None):
+    """
+    Result of a task for Frontier.complete : url_title dict of a listing or {'nouns'} of an article
+    """
+    if task['kind'] == 'listing':
+        def fetch(pagenum):
+            url = pageurl_template(task['category'], pagenum, task['date'])
+            return parse_listing(httpcache.get_text(rewrite_host(url, base_url), cache, policy))
+        return scrape_day(fetch, probes)
+
+    html = httpcache.get_text(rewrite_host(task['key'], base_url), cache, policy)
+    with metrics.timer('tokenize'):
+        nouns = nouns_from_text(mecab, parse_article(html))
+    metrics.count('documents')
+    return dict(nouns=nouns)
+
+
+def work(frontier_url, batch_size=16, base_url=None, cache_options=None, probes=8, policy=None, poll=1.0):
+    """
+    Lease batches of tasks until the frontier has nothing left, dropping tasks of the batch that the frontier
+    handed to another worker meanwhile(stolen, or expired while this worker was stalled)
+    Return the number of tasks completed by this worker
+    """
+    from konlpy.tag import Mecab
+    mecab = Mecab()
+    cache = httpcache.open_cache(**(cache_options or {}))
+    client = FrontierClient(frontier_url, f"{socket.gethostname()}-{os.getpid()}")
+    tasks = []
+    n_done = 0
+    while True:
+        if not tasks:
+            reply = client.call('lease', n=batch_size)
+            if reply['finished']:
+                break
+            tasks = reply['tasks']
+            if not tasks:
+                time.sleep(poll)
+                continue
+
+        task = tasks.pop(0)
+        try:
+            result = run_task(task, mecab, base_url, cache, probes, policy)
+        except Exception as error:
+            reply = client.call('fail', key=task['key'], error=f"{type(error).__name__}: {error}")
+        else:
+            reply = client.call('complete', key=task['key'], result=result)
+            n_done += 1
+        leased = set(reply['leased'])
+        tasks = [task for task in tasks if task['key'] in leased]
+    metrics.flush(force=True)
+    return n_done
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Crawl listings and articles leased from a frontier served by frontier.py')
+    parser.add_argument('frontier', help='URL of the frontier, e.g. http://10.0.0.1:8900')
+    parser.add_argument('-n', '--workers', type=int, metavar='', help='Number of worker processes. Defaults to number of cores')
+    parser.add_argument('-b', '--batch-size', type=int, default=16, metavar='', help='Number of tasks leased at once')
+    parser.add_argument('--probes', type=int, default=8, metavar='', help='Listing pages of a day fetched at once')
+    parser.add_argument('--base-url', metavar='', help='Send every request to this host instead, e.g. http://127.0.0.1:8765 for daum_standin.py')
+    parser.add_argument('--cache', metavar='', help='Directory of local response cache of listing and article pages. Not used if omitted')
+    parser.add_argument('--cache-size', type=int, default=2048, metavar='', help='Maximum size of response cache in MB')
+    parser.add_argument('--extractor', choices=['bs4', 'lxml'], metavar='', help="HTML extractor, 'bs4' or 'lxml'")
+    fetchpolicy.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.extractor:
+        set_extractor(args.extractor)
+    cache_options = dict(dirname=args.cache, max_bytes=args.cache_size * 1024**2)
+    n_workers = args.workers or os.cpu_count()
+    time_started = time.time()
+    with mp.Pool(n_workers) as pool:
+        jobs = [pool.apply_async(work, (args.frontier, args.batch_size, args.base_url, cache_options, args.probes,
+                                        fetchpolicy.from_arguments(args)))
+                for _ in range(n_workers)]
+        n_done = sum(job.get() for job in jobs)
+    minutes, seconds = list(map(int, divmod(time.time() - time_started, 60)))
+    print(f">>> {n_workers} workers completed {n_done} tasks in {minutes}m {seconds}s")
@@ -0,0 +1,307 @@
+import os, re, datetime
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+from bs4 import BeautifulSoup
+try:
+    import lxml.html, lxml.etree
+except ImportError:
+    lxml = None
+
+
+"""
+Helpers shared by the crawlers to build Daum URLs and parse listing/article pages
+encoding : UTF-8
+"""
+
+
+paper_publishers = ['한국일보','문화일보','동아일보','서울신문','세계일보','경향신문','국민일보','중앙일보','한겨레','조선일보']
+pattern = re.compile("[\[(].{1,20}[\])]")
+KST = datetime.timezone(datetime.timedelta(hours=9))
+
+
+class PageError(ValueError):
+    """
+    Page without the part the parser looks for, e.g. an error or maintenance page answered with 200 OK
+    """
+
+
+def pageurl_template(category, pagenum, date):
+    """
+    Function to return formatted URL given category, page number, date
+    """
+    assert len(str(date)) == 8, 'Invalid input date format'
+    return f"https://news.daum.net/breakingnews/{category}?page={pagenum}&regDate={date}"
+
+
+def rewrite_host(url, base_url):
+    """
+    Point URL at another scheme and host(e.g. local stand-in server), keeping path and query
+    """
+    if not base_url:
+        return url
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+
+def date_formatting(date):
+    """
+    Convert datetime.date object into yyyymmdd format string
+    """
+    year = str(date.year)
+    month = str(date.month).rjust(2, '0')
+    day = str(date.day).rjust(2, '0')
+    return year + month + day
+
+
+def today():
+    """
+    Today's date in Korea in yyyymmdd format, by which Daum dates its listings, whatever the timezone of the host
+    """
+    return datetime.datetime.now(KST).strftime('%Y%m%d')
+
+
+def get_datelist(start, end):
+    """
+    Given start, end date in yyyymmdd format, obtain list of dates(yyyymmdd) in between
+    """
+    assert len(start) == 8, 'start date not in proper format: yyyymmdd'
+    assert len(end) == 8, 'end date not in proper format: yyyymmdd'
+    
+    start_list = [start[:4], start[4:6], start[6:]]
+    end_list = [end[:4], end[4:6], end[6:]]
+    
+    start_date = datetime.date(*list(map(int, start_list)))
+    end_date = datetime.date(*list(map(int, end_list)))
+    delta = (end_date - start_date).days
+    assert delta >= 0, 'start date must precede end date'
+    
+    date_list = [start_date + datetime.timedelta(d) for d in range(delta+1)]
+    return list(map(date_formatting, date_list))
+
+
+def parse_listing_bs4(html):
+    """
+    Parse a breaking news listing page into {'urls':[], 'titles':[], 'last':bool}
+    'last' is True when the page is past the final page of the day(p.txt_none)
+    """
+    url_title = dict({'urls':[], 'titles':[], 'last':False})
+    parsed = BeautifulSoup(html, 'html.parser')
+    body = parsed.find('div', attrs={'class':'box_etc'})
+    if body is None:
+        raise PageError('listing page without div.box_etc')
+
+    if body.select('p.txt_none'):
+        url_title['last'] = True
+        return url_title
+
+    articles = body.select('div.cont_thumb')
+    for tag in articles:
+        publisher = tag.find('span', attrs={'class':'info_news'}).get_text().split()[0]
+        if publisher in paper_publishers:
+            a_tag = tag.find('a')
+            url_title['urls'].append(a_tag['href'])
+            url_title['titles'].append(a_tag.get_text())
+    return url_title
+
+
+def search_pages(probes=8):
+    """
+    Generator searching the number of listing pages of a day, assuming pages past the last one are empty
+    It yields lists of page numbers that can be fetched concurrently and is sent back whether each of them is empty,
+    probing pages 1, 2, 4, ... until one is empty and then narrowing the gap with up to `probes` pages per round
+    Returns the number of non-empty pages
+    """
+    lo, hi = 0, None
+    start = 1
+    while hi is None:
+        pagenums = [start * 2**i for i in range(probes)]
+        for pagenum, last in zip(pagenums, (yield pagenums)):
+            if last:
+                hi = pagenum
+                break
+            lo = pagenum
+        start = pagenums[-1] * 2
+
+    while hi - lo > 1:
+        pagenums = sorted({lo + (hi - lo) * i // (probes + 1) for i in range(1, probes + 1)} - {lo})
+        for pagenum, last in zip(pagenums, (yield pagenums)):
+            if last:
+                hi = pagenum
+                break
+            lo = pagenum
+    return lo
+
+
+def merge_pages(pages, n_pages):
+    """
+    url_title dict of pages 1..n_pages given {page number:parsed listing}
+    """
+    url_title = dict({'urls':[], 'titles':[]})
+    for pagenum in range(1, n_pages + 1):
+        url_title['urls'] += pages[pagenum]['urls']
+        url_title['titles'] += pages[pagenum]['titles']
+    return url_title
+
+
+def scrape_day(fetch, probes=None):
+    """
+    url_title dict of a day given fetch(page number) returning a parsed listing page
+    With probes, the number of pages is searched with up to `probes` threads per round(search_pages)
+    and the rest of the pages are fetched concurrently, instead of walking pages one by one
+    """
+    if probes:
+        pages = {}
+        with ThreadPoolExecutor(probes) as executor:
+            search = search_pages(probes)
+            pagenums = next(search)
+            while True:
+                pages.update(zip(pagenums, executor.map(fetch, pagenums)))
+                try:
+                    pagenums = search.send([pages[pagenum]['last'] for pagenum in pagenums])
+                except StopIteration as stop:
+                    n_pages = stop.value
+                    break
+            missing = [pagenum for pagenum in range(1, n_pages + 1) if pagenum not in pages]
+            pages.update(zip(missing, executor.map(fetch, missing)))
+        return merge_pages(pages, n_pages)
+
+    pagenum = 1
+    url_title = dict({'urls':[], 'titles':[]})
+    while True:
+        page = fetch(pagenum)
+        if page['last']:
+            break
+        url_title['urls'] += page['urls']
+        url_title['titles'] += page['titles']
+        pagenum += 1
+    return url_title
+
+
+def parse_paragraphs_bs4(html):
+    """
+    Extract paragraphs of body text of an article page, dropping short ones and ones with e-mail addresses
+    """
+    parsed = BeautifulSoup(html, 'html.parser')
+    body = parsed.find('div', attrs={'class':'news_view'})
+    if body is None:
+        raise PageError('article page without div.news_view')
+    text_tags = body.find_all('p', attrs={'dmcf-ptype':'general'})
+    return [tag.get_text().strip()
+            for tag in text_tags
+            if '@' not in tag.get_text() and len(tag.get_text()) > 8]
+
+
+def with_class(tag, name):
+    """
+    XPath step matching tag elements having name among their classes, like CSS tag.name
+    """
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+def first(elements):
+    return elements[0] if elements else None
+
+
+def parse_lxml(html):
+    """
+    Root element of html, None for an empty document that lxml refuses to parse(html.parser gives an empty tree)
+    """
+    # libxml2 turns \r\n into \n while html.parser keeps it, so carriage returns are kept as character references
+    try:
+        return lxml.html.fromstring(html.replace('\r', '&#13;'))
+    except (lxml.etree.ParserError, lxml.etree.XMLSyntaxError):
+        return None
+
+
+def find_lxml(html, xpath):
+    """
+    First element of the parsed html matching xpath, None if there is none or the document is empty
+    """
+    root = parse_lxml(html)
+    return first(root.xpath(xpath)) if root is not None else None
+
+
+def get_text(element):
+    """
+    Text of element like bs4 get_text(), which leaves out comments and contents of script and style
+    """
+    return ''.join(element.xpath('.//text()[not(ancestor::script) and not(ancestor::style)]'))
+
+
+def parse_listing_lxml(html):
+    """
+    parse_listing_bs4 on the C parser of lxml, selecting only the nodes it reads with XPath
+    """
+    url_title = dict({'urls':[], 'titles':[], 'last':False})
+    body = find_lxml(html, '//' + with_class('div', 'box_etc'))
+    if body is None:
+        raise PageError('listing page without div.box_etc')
+
+    if body.xpath('.//' + with_class('p', 'txt_none')):
+        url_title['last'] = True
+        return url_title
+
+    for tag in body.xpath('.//' + with_class('div', 'cont_thumb')):
+        publisher = get_text(first(tag.xpath('.//' + with_class('span', 'info_news')))).split()[0]
+        if publisher in paper_publishers:
+            a_tag = first(tag.xpath('.//a'))
+            url_title['urls'].append(a_tag.attrib['href'])
+            url_title['titles'].append(get_text(a_tag))
+    return url_title
+
+
+def parse_paragraphs_lxml(html):
+    """
+    parse_paragraphs_bs4 on the C parser of lxml
+    """
+    body = find_lxml(html, '//' + with_class('div', 'news_view'))
+    if body is None:
+        raise PageError('article page without div.news_view')
+    texts = [get_text(tag) for tag in body.xpath(".//p[@dmcf-ptype='general']")]
+    return [text.strip()
+            for text in texts
+            if '@' not in text and len(text) > 8]
+
+
+EXTRACTORS = {'bs4': (parse_listing_bs4, parse_paragraphs_bs4),
+              'lxml': (parse_listing_lxml, parse_paragraphs_lxml)}
+extractor = os.environ.get('DAUM_EXTRACTOR') or ('lxml' if lxml else 'bs4')
+
+
+def set_extractor(name):
+    """
+    Choose the backend of parse_listing and parse_paragraphs. The choice is kept in DAUM_EXTRACTOR
+    so that worker processes started afterwards use the same backend
+    """
+    global extractor
+    assert name in EXTRACTORS, f"extractor must be one of {list(EXTRACTORS)}"
+    assert name != 'lxml' or lxml, 'lxml is not installed'
+    extractor = os.environ['DAUM_EXTRACTOR'] = name
+
+
+def parse_listing(html):
+    with metrics.timer('parse'):
+        return EXTRACTORS[extractor][0](html)
+
+
+def parse_paragraphs(html):
+    with metrics.timer('parse'):
+        return EXTRACTORS[extractor][1](html)
+
+
+def parse_article(html):
+    """
+    Extract body text of an article page as one string
+    """
+    return ' '.join(parse_paragraphs(html))
+
+
+def nouns_from_text(mecab, text):
+    """
+    Extract nouns longer than one character from text using konlpy.Mecab
+    """
+    return [word
+            for word in mecab.nouns(pattern.sub('', text))
+            if len(word) > 1]
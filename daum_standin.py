@@ -0,0 +1,85 @@
+import os, time, argparse
+from urllib.parse import quote, urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+"""
+Local HTTP stand-in for news.daum.net / v.daum.net serving recorded pages
+Run the crawler against it with `--base-url http://127.0.0.1:PORT`
+encoding : UTF-8
+"""
+
+
+EMPTY_LISTING = '<html><body><div class="box_etc"><p class="txt_none">no articles</p></div></body></html>'
+
+
+def record_name(path):
+    """
+    File name of a recorded page given request path and query(e.g. /breakingnews/politics?page=1&regDate=20200801)
+    """
+    return quote(path, safe='') + '.html'
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """
+    Serve recorded pages from `record_dir`, optionally downloading and saving pages that are not recorded yet
+    Listing pages that are not recorded are answered with an empty listing so that the crawler stops paginating
+    """
+    record_dir = '.'
+    upstream = None
+    delay = 0.0
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        filename = os.path.join(self.record_dir, record_name(self.path))
+        if not os.path.exists(filename) and self.upstream:
+            self.record(filename)
+
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                self.respond(200, f.read())
+        elif urlsplit(self.path).path.startswith('/breakingnews/'):
+            self.respond(200, EMPTY_LISTING.encode())
+        else:
+            self.respond(404, b'')
+
+    def record(self, filename):
+        import requests
+        host = 'news.daum.net' if self.path.startswith('/breakingnews/') else self.upstream
+        response = requests.get(f"https://{host}{self.path}", timeout=30)
+        if response.ok:
+            with open(filename, 'wb') as f:
+                f.write(response.content)
+
+    def respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Local stand-in server that serves recorded Daum pages')
+    parser.add_argument('record_dir', help='Directory of recorded pages')
+    parser.add_argument('-p', '--port', type=int, default=8765, metavar='', help='Port to listen on')
+    parser.add_argument('-r', '--record', action='store_true',
+                        help='Download pages missing from record_dir from Daum(articles from v.daum.net) and save them')
+    parser.add_argument('-d', '--delay', type=float, default=0.0, metavar='',
+                        help='Seconds to wait before each response, to imitate round-trip time to Daum')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.record_dir):
+        os.mkdir(args.record_dir)
+    StandinHandler.record_dir = args.record_dir
+    StandinHandler.upstream = 'v.daum.net' if args.record else None
+    StandinHandler.delay = args.delay
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StandinHandler)
+    print(f">>> Serving {args.record_dir} on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,104 @@
+import os
+from shardstore import ShardStore
+from daum import today
+
+
+"""
+Per-category, per-day store of URLs, titles and nouns for incremental crawling
+encoding : UTF-8
+"""
+
+
+class DayStore:
+    """
+    Articles of one category published on one date, under dirs/days/{category}/{yyyymmdd}
+        urllist.txt, titlelist.txt : articles of the day in order of first discovery
+        shards/                    : ShardStore whose indexes refer to urllist.txt of the day
+        listed                     : marker written once the listing of a past day is scraped completely
+    New URLs found by scraping the listing again are appended, so stored indexes stay valid
+    """
+    def __init__(self, dir_home, category, date):
+        self.date = date
+        self.dirname = os.path.join(dir_home, 'days', category, date)
+        os.makedirs(self.dirname, exist_ok=True)
+        self.store = ShardStore(self.dirname)
+
+    def read(self, name):
+        path = os.path.join(self.dirname, name)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r') as f:
+            return f.read().split('\n')[:-1]
+
+    def urls(self):
+        return self.read('urllist.txt')
+
+    def titles(self):
+        return self.read('titlelist.txt')
+
+    def listed(self):
+        return os.path.exists(os.path.join(self.dirname, 'listed'))
+
+    def merge_listing(self, url_title):
+        """
+        Append URLs(and their titles) of url_title that are not known yet, marking past days as listed
+        """
+        known = set(self.urls())
+        with open(os.path.join(self.dirname, 'urllist.txt'), 'a') as f_url, \
+             open(os.path.join(self.dirname, 'titlelist.txt'), 'a') as f_title:
+            for url, title in zip(url_title['urls'], url_title['titles']):
+                if url not in known:
+                    known.add(url)
+                    f_url.write(url + '\n')
+                    f_title.write(title + '\n')
+        if self.date < today():
+            open(os.path.join(self.dirname, 'listed'), 'w').close()
+
+    def remaining(self):
+        return self.store.remaining(len(self.urls()))
+
+
+class DayRouter:
+    """
+    Store-like object that routes append(job number, nouns) to the DayStore the job belongs to,
+    so that the crawl engines can process articles of many days as one flat list of jobs
+    """
+    def __init__(self, days):
+        self.jobs = []
+        self.urllist = []
+        for day in days:
+            urls = day.urls()
+            for idx in day.remaining():
+                self.jobs.append((day, idx))
+                self.urllist.append(urls[idx])
+
+    def append(self, job, nouns):
+        day, idx = self.jobs[job]
+        day.store.append(idx, nouns)
+
+    def close(self):
+        for day in set(day for day, _ in self.jobs):
+            day.store.close()
+
+
+def assemble(days, dirname):
+    """
+    Write urllist.txt, titlelist.txt and shards of the window made of days into dirname
+    Return ShardStore of the window
+    """
+    os.makedirs(dirname, exist_ok=True)
+    store = ShardStore(dirname)
+    store.reset()
+    offset = 0
+    with open(os.path.join(dirname, 'urllist.txt'), 'w') as f_url, \
+         open(os.path.join(dirname, 'titlelist.txt'), 'w') as f_title:
+        for day in days:
+            urls = day.urls()
+            for url, title in zip(urls, day.titles()):
+                f_url.write(url + '\n')
+                f_title.write(title + '\n')
+            for idx, nouns in day.store.records():
+                store.append(offset + idx, nouns)
+            offset += len(urls)
+    store.close()
+    return store
@@ -0,0 +1,102 @@
+import os, json, zlib
+import numpy as np
+
+
+"""
+Near-duplicate detection of articles with MinHash signatures over noun shingles and an LSH index,
+so that a story republished by several publishers is kept once in the corpus
+encoding : UTF-8
+"""
+
+
+PRIME = (1 << 31) - 1
+
+
+def shingles(nouns, k=3):
+    """
+    CRC32 hashes of the distinct runs of k consecutive nouns
+    """
+    if len(nouns) < k:
+        grams = [' '.join(nouns)] if nouns else []
+    else:
+        grams = {' '.join(nouns[i:i + k]) for i in range(len(nouns) - k + 1)}
+    return np.array([zlib.crc32(gram.encode('utf-8')) for gram in grams], dtype=np.uint64)
+
+
+class MinHasher:
+    """
+    num_perm random hash functions (a * x + b) mod PRIME, whose minimum over the shingles of a document
+    agrees between two documents with probability equal to their Jaccard similarity
+    """
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, PRIME, size=num_perm).astype(np.uint64)[:, None]
+        self.b = rng.randint(0, PRIME, size=num_perm).astype(np.uint64)[:, None]
+
+    def signature(self, hashes):
+        return ((self.a * (hashes % PRIME) + self.b) % PRIME).min(axis=1)
+
+
+def find_duplicates(records, threshold=0.7, num_perm=128, bands=16, k=3):
+    """
+    Cluster near-duplicate documents among (index in urllist, nouns) records
+    Documents sharing a bucket in any of the bands of their signatures are compared with the first document of
+    the bucket, and joined when the estimated Jaccard similarity of their shingles is at least threshold
+    Return {representative index:[indexes of its duplicates]}, the representative being the first in records
+    """
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    docids, signatures = [], []
+    for idx, nouns in records:
+        hashes = shingles(nouns, k)
+        if len(hashes):
+            docids.append(idx)
+            signatures.append(hasher.signature(hashes))
+    if not signatures:
+        return {}
+    signatures = np.vstack(signatures)
+
+    parent = list(range(len(docids)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        for i, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            anchor = buckets.setdefault(key, i)
+            if anchor != i and find(anchor) != find(i):
+                if np.mean(signatures[anchor] == signatures[i]) >= threshold:
+                    parent[max(find(anchor), find(i))] = min(find(anchor), find(i))
+
+    clusters = {}
+    for i in range(len(docids)):
+        if find(i) != i:
+            clusters.setdefault(docids[find(i)], []).append(docids[i])
+    return clusters
+
+
+def dedupe(records, dirname, **options):
+    """
+    Drop near-duplicates from records, saving {representative:[duplicates]} as dirname/duplicates.json
+    Return the records that are kept
+    """
+    records = list(records)
+    clusters = find_duplicates(records, **options)
+    dropped = {idx for duplicates in clusters.values() for idx in duplicates}
+    with open(os.path.join(dirname, 'duplicates.json'), 'w') as f:
+        json.dump({str(idx): duplicates for idx, duplicates in clusters.items()}, f)
+    return [(idx, nouns) for idx, nouns in records if idx not in dropped]
+
+
+def load_duplicates(dirname):
+    """
+    {representative index:[indexes of its duplicates]} saved by dedupe, empty if the corpus was not deduplicated
+    """
+    path = os.path.join(dirname, 'duplicates.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return {int(idx): duplicates for idx, duplicates in json.load(f).items()}
@@ -1,8 +1,12 @@
-from gensim.corpora import Dictionary
-from gensim.models.ldamulticore import LdaModel
+from gensim.models import LdaModel, LdaMulticore
+from gensim.models.coherencemodel import CoherenceModel
 from gensim.test.utils import datapath
 import pandas as pd
-import os, time, pickle, argparse
+import numpy as np
+import os, time, pickle, argparse, json, hashlib, multiprocessing
+from shardstore import ShardStore
+from bowcorpus import build_bow, MmapCorpus
+from dedup import dedupe, load_duplicates
 
 
 parser = argparse.ArgumentParser(description='Script to estimate parameters of LDA and save result files')
@@ -17,32 +21,254 @@ parser.add_argument('-e', '--end-date',  metavar='', help='Information for direc
 parser.add_argument('-k', '--num-topics', type=int, metavar='', help='Number of topics')
 parser.add_argument('-na', '--top-na', type=int, metavar='', help='Number of articles to be presented for each topic')
 parser.add_argument('-nv', '--top-nv', type=int, metavar='', help='Number of vocabularies to be presented for each topic')
-args = parser.parse_args()
+parser.add_argument('-w', '--workers', type=int, default=max(1, multiprocessing.cpu_count() - 1), metavar='',
+                    help='Number of worker processes to fit LDA. 1 fits with a single process. Defaults to number of cores - 1')
+parser.add_argument('--chunksize', type=int, default=2000, metavar='', help='Number of documents in each training chunk')
+parser.add_argument('--passes', type=int, default=1, metavar='', help='Number of passes through the corpus')
+parser.add_argument('--iterations', type=int, default=50, metavar='', help='Maximum number of inference iterations per document')
+parser.add_argument('--sweep', metavar='',
+                    help='Fit models for several numbers of topics in parallel and keep the best one, '
+                         'given as a list(10,20,30) or a range(start:stop:step, e.g. 10:50:10)')
+parser.add_argument('--refit', action='store_true',
+                    help='Fit the best number of topics of a sweep again on every article, instead of keeping the sweep model '
+                         'fitted without every 10th article. Adds the time of one more fit')
+parser.add_argument('--sweep-metric', choices=['coherence', 'perplexity'], default='coherence',
+                    help='Score to choose the best number of topics by : u_mass coherence or held-out perplexity')
+parser.add_argument('--update', action='store_true',
+                    help='Update the saved model with documents added since it was fitted or last updated, instead of fitting a new one')
+args = None
+HELDOUT = 10
 
 
-def docs_by_topic(model, corpus, topn=20):
+def load_corpus(dirname):
     """
-    Create dictionary of {topic number:[indices of most relevant documents]}
+    Memory-map the bag-of-words corpus of dirname, building it first from the shards(or legacy corpus pickle)
+    when it is missing or older than the shards. Near-duplicates are left out again if getcorpus left them out
     """
-    triplets = []
-    for docidx, doc in enumerate(corpus):
-        triplets += [(topic, docidx, proportion) for topic, proportion in model.get_document_topics(doc)]
-    parsed_docs = pd.DataFrame(triplets, columns=['topic', 'docidx', 'proportion'])
-    return parsed_docs.sort_values(['topic', 'proportion'], ascending=[True, False]).groupby('topic').head(topn)
+    bow_dir = os.path.join(dirname, 'bow')
+    store = ShardStore(dirname)
+    if store.exists():
+        updated = max(os.path.getmtime(shard) for shard in store.shards())
+        if not os.path.exists(bow_dir) or os.path.getmtime(os.path.join(bow_dir, 'indptr.npy')) < updated:
+            records = store.records()
+            if os.path.exists(os.path.join(dirname, 'duplicates.json')):
+                records = dedupe(records, dirname)
+            build_bow(records, bow_dir)
+    elif not os.path.exists(bow_dir):
+        with open(os.path.join(dirname, 'corpus'), 'rb') as f:
+            build_bow(enumerate(pickle.load(f)), bow_dir)
+    return MmapCorpus(bow_dir)
+
+
+def corpus_digest(corpus, n_docs, n_terms):
+    """
+    Digest of the first n_docs documents and first n_terms words of corpus, to check that a model's data is unchanged
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(corpus.docids[:n_docs]).tobytes())
+    digest.update('\n'.join(corpus.id2word[i] for i in range(n_terms)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_info(dirname):
+    """
+    Version and training history of the model of dirname saved in model_info.json
+    """
+    path = os.path.join(dirname, 'model_info.json')
+    if not os.path.exists(path):
+        return dict(version=0, history=[])
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_model(model, name, corpus, dirname, mode, elapsed, perplexity=None, heldout=None):
+    """
+    Save model as both latest and versioned(name.vN) model, recording the documents and words it has seen
+    heldout is given when every heldout-th document of corpus was left out of the fit(sweep), so that --update
+    learns them along with the new documents
+    """
+    info = load_info(dirname)
+    info['version'] += 1
+    info['n_docs'] = len(corpus)
+    info['heldout'] = heldout
+    info['n_terms'] = model.num_terms
+    info['digest'] = corpus_digest(corpus, len(corpus), model.num_terms)
+    info['history'].append(dict(version=info['version'], mode=mode, n_docs=len(corpus), heldout=heldout, n_terms=model.num_terms,
+                                seconds=round(elapsed, 2), perplexity=perplexity, saved=time.strftime('%Y-%m-%d %H:%M:%S')))
+    model.save(datapath(name))
+    model.save(datapath(f"{name}.v{info['version']}"))
+    with open(os.path.join(dirname, 'model_info.json'), 'w') as f:
+        json.dump(info, f, indent=2)
+    return info['version']
+
+
+def extend_model(model, id2word):
+    """
+    Copy of model whose vocabulary is extended to id2word
+    Topic-word statistics of known words are kept, new words start as in a freshly initialized model
+    """
+    n_terms = len(id2word)
+    eta = np.concatenate([model.eta, np.full(n_terms - model.num_terms, model.eta.mean(), dtype=model.eta.dtype)])
+    extended = LdaModel(id2word=id2word, num_topics=model.num_topics, alpha=model.alpha, eta=eta,
+                        chunksize=model.chunksize, decay=model.decay, offset=model.offset,
+                        iterations=model.iterations, gamma_threshold=model.gamma_threshold, dtype=model.dtype)
+    extended.state.sstats[:, :model.num_terms] = model.state.sstats
+    extended.state.numdocs = model.state.numdocs
+    extended.num_updates = model.num_updates
+    extended.sync_state()
+    return extended
+
+
+def fit_model(corpus, n_topics, workers, chunksize=2000, passes=1, iterations=50):
+    """
+    Fit LDA on corpus one pass at a time, printing throughput of each pass
+    Training is spread over `workers` processes with LdaMulticore unless workers is 1
+    """
+    if workers > 1:
+        model = LdaMulticore(id2word=corpus.id2word, num_topics=n_topics, workers=workers,
+                             chunksize=chunksize, passes=1, iterations=iterations)
+    else:
+        model = LdaModel(id2word=corpus.id2word, num_topics=n_topics,
+                         chunksize=chunksize, passes=1, iterations=iterations)
+    for p in range(passes):
+        start = time.time()
+        model.update(corpus)
+        elapsed = time.time() - start
+        print(f">>> Pass {p+1}/{passes} : {elapsed:.1f}s, {len(corpus) / max(elapsed, 1e-9):.0f} documents/s")
+    return model
+
+
+def perplexity(model, corpus):
+    """
+    Per-word perplexity of corpus under model
+    """
+    return float(np.exp2(-model.log_perplexity(list(corpus))))
+
+
+def parse_sweep(text):
+    """
+    List of numbers of topics from '10,20,30' or 'start:stop:step'(stop inclusive)
+    """
+    if ':' in text:
+        start, stop, step = list(map(int, text.split(':')))
+        return list(range(start, stop + 1, step))
+    return list(map(int, text.split(',')))
+
+
+def unseen(corpus, n_docs, heldout=None):
+    """
+    Mask of documents of corpus that a model fitted on the first n_docs has not seen : the documents added
+    afterwards, and every heldout-th one of the first n_docs if it was fitted without them
+    """
+    positions = np.arange(len(corpus))
+    mask = positions >= n_docs
+    if heldout:
+        mask |= positions % heldout == 0
+    return mask
+
+
+def sweep_fit(bow_dir, n_topics, model_path, chunksize, passes, iterations):
+    """
+    Fit one model of the sweep on every document but each HELDOUT-th one, score it and save it at model_path
+    Each worker process memory-maps the corpus itself instead of receiving a copy
+    """
+    corpus = MmapCorpus(bow_dir)
+    heldout = unseen(corpus, len(corpus), HELDOUT)
+    train = corpus.subset(~heldout)
+    start = time.time()
+    model = LdaModel(train, id2word=corpus.id2word, num_topics=n_topics,
+                     chunksize=chunksize, passes=passes, iterations=iterations)
+    elapsed = time.time() - start
+    model.save(model_path)
+    return dict(num_topics=n_topics,
+                perplexity=perplexity(model, corpus.subset(heldout)),
+                coherence=CoherenceModel(model=model, corpus=train, coherence='u_mass').get_coherence(),
+                seconds=round(elapsed, 2))
+
+
+def sweep(corpus, topic_counts, name, workers, chunksize=2000, passes=1, iterations=50):
+    """
+    Fit models for every number of topics in topic_counts in parallel processes
+    Return DataFrame of held-out perplexity and u_mass coherence of each model
+    """
+    jobs = [(corpus.dirname, k, datapath(f"{name}.k{k}"), chunksize, passes, iterations) for k in topic_counts]
+    with multiprocessing.Pool(min(workers, len(jobs))) as pool:
+        results = pool.starmap(sweep_fit, jobs)
+    return pd.DataFrame(results)
+
+
+def document_topics(model, corpus, chunksize=2000):
+    """
+    Dense (documents * topics) matrix of topic proportions, inferred one chunk of documents at a time
+    """
+    theta = np.zeros((len(corpus), model.num_topics), dtype=np.float32)
+    for start in range(0, len(corpus), chunksize):
+        chunk = [corpus[i] for i in range(start, min(start + chunksize, len(corpus)))]
+        gamma, _ = model.inference(chunk)
+        theta[start:start + len(chunk)] = gamma / gamma.sum(axis=1, keepdims=True)
+    return theta
 
 
-def vocabs_by_topic(model, dictionary, topn=20):
+def docs_by_topic(theta, topn=20):
+    """
+    Create DataFrame of (topic, docidx, proportion) of the topn most relevant documents of each topic
+    given document-topic matrix theta
+    """
+    topn = min(topn, len(theta))
+    top = np.argpartition(-theta, topn - 1, axis=0)[:topn]
+    proportions = np.take_along_axis(theta, top, axis=0)
+    order = np.argsort(-proportions, axis=0, kind='stable')
+    top = np.take_along_axis(top, order, axis=0)
+    proportions = np.take_along_axis(proportions, order, axis=0)
+    return pd.DataFrame({'topic':np.repeat(np.arange(theta.shape[1]), topn),
+                         'docidx':top.T.ravel(),
+                         'proportion':proportions.T.ravel()})
+
+
+def vocabs_by_topic(model, id2word, topn=20):
     """
     Create dictionary of {topic number:[indices of composing words of corresponding topic]}
     """
     triplets = []
     for k in range(model.num_topics):
         topn_vocabs = model.get_topic_terms(k, topn)
-        triplets += [(k, dictionary.id2token[vocainfo[0]] , vocainfo[1]) for vocainfo in topn_vocabs]
+        triplets += [(k, id2word[vocainfo[0]] , vocainfo[1]) for vocainfo in topn_vocabs]
     return pd.DataFrame(triplets, columns=['topic', 'vocabulary', 'proportion'])
 
 
-if __name__ == '__main__':
+def export_serving(dirname, category, yyyymm, topn_vocabs, topn_articles):
+    """
+    Write serving_{category}_{yyyymm}.json : top words and top (title, url) of each topic with the near-duplicates
+    of each article as alternates, loaded into the web app
+    with `python manage.py loadserving`
+    """
+    with open(os.path.join(dirname, 'titlelist.txt'), 'r') as f:
+        titlelist = f.read().split('\n')
+    with open(os.path.join(dirname, 'urllist.txt'), 'r') as f:
+        urllist = f.read().split('\n')
+    duplicates = load_duplicates(dirname)
+
+    topics = []
+    for k, vocabs in topn_vocabs.groupby('topic'):
+        articles = topn_articles.loc[topn_articles['topic'] == k]
+        topics.append(dict(topic=int(k),
+                           words=vocabs['vocabulary'].tolist(),
+                           articles=[dict(title=titlelist[docidx], url=urllist[docidx],
+                                          alternates=[dict(title=titlelist[idx], url=urllist[idx])
+                                                      for idx in duplicates.get(docidx, [])])
+                                     for docidx in articles['docidx'].tolist()]))
+
+    path = os.path.join(dirname, f"serving_{category}_{yyyymm}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(category=category, year=int(yyyymm[:4]), month=int(yyyymm[4:]), topics=topics), f, ensure_ascii=False)
+    return path
+
+
+def main(argv=None):
+    """
+    Run estimate with command line arguments argv, returning the path of the serving artifact
+    """
+    global args
+    args = parser.parse_args(argv)
 
     category = args.category
     start_date = args.start_date
@@ -52,17 +278,56 @@ if __name__ == '__main__':
     n_vocabs = args.top_nv
 
     DIR_NAME = os.path.join('./dirs', f"{category}-{start_date}-{end_date}")
-    with open(os.path.join(DIR_NAME, 'corpus'), 'rb') as f:
-        corpus = pickle.load(f)
-    dictionary = Dictionary(corpus)
-    gensim_corpus = [dictionary.doc2bow(doc) for doc in corpus]
+    gensim_corpus = load_corpus(DIR_NAME)
 
 
-    if args.estimate == 'y':
-        print("\nEstimating parameters of LDA model")
+    if args.update:
+        info = load_info(DIR_NAME)
+        assert info['version'] > 0, 'No saved model to update. Fit a model first'
+        assert corpus_digest(gensim_corpus, info['n_docs'], info['n_terms']) == info['digest'], \
+            'Documents or words the model was fitted on have changed. Fit a new model instead'
+        new_docs = gensim_corpus.subset(unseen(gensim_corpus, info['n_docs'], info.get('heldout')))
+        print(f"\nUpdating LDA model with {len(new_docs)} new articles and {len(gensim_corpus.id2word) - info['n_terms']} new words")
+        if len(new_docs):
+            start = time.time()
+            model = extend_model(LdaModel.load(datapath(f"{category}-{start_date}-{end_date}")), gensim_corpus.id2word)
+            before = perplexity(model, new_docs)
+            model.update(new_docs)
+            after = perplexity(model, new_docs)
+            elapsed = time.time() - start
+            version = save_model(model, f"{category}-{start_date}-{end_date}", gensim_corpus, DIR_NAME, 'update', elapsed, after)
+            minute, second = list(map(int, divmod(elapsed, 60)))
+            print(f">>> Perplexity of new articles : {before:.1f} -> {after:.1f}")
+            print(f">>> Saved as version {version}, elapsed time : {minute}m {second}s")
+
+    elif args.sweep:
+        topic_counts = parse_sweep(args.sweep)
+        print(f"\nEstimating LDA models with {topic_counts} topics in parallel")
         start = time.time()
-        model = LdaModel(gensim_corpus, id2word=dictionary, num_topics=n_topics)
-        model.save(datapath(f"{category}-{start_date}-{end_date}"))
+        results = sweep(gensim_corpus, topic_counts, f"{category}-{start_date}-{end_date}",
+                        args.workers, args.chunksize, args.passes, args.iterations)
+        results.to_csv(os.path.join(DIR_NAME, 'sweep.csv'), index=False)
+        print(results.to_string(index=False))
+
+        ascending = args.sweep_metric == 'perplexity'
+        best = int(results.sort_values(args.sweep_metric, ascending=ascending)['num_topics'].iloc[0])
+        print(f">>> Best number of topics by {args.sweep_metric} : {best}, results are saved as {DIR_NAME + '/sweep.csv'}")
+        if args.refit:
+            print(f"\nEstimating LDA model with {best} topics on every article")
+            model = fit_model(gensim_corpus, best, args.workers, args.chunksize, args.passes, args.iterations)
+            save_model(model, f"{category}-{start_date}-{end_date}", gensim_corpus, DIR_NAME, 'sweep', time.time() - start)
+        else:
+            model = LdaModel.load(datapath(f"{category}-{start_date}-{end_date}.k{best}"))
+            save_model(model, f"{category}-{start_date}-{end_date}", gensim_corpus, DIR_NAME, 'sweep',
+                       time.time() - start, heldout=HELDOUT)
+        minute, second = list(map(int, divmod(time.time() - start, 60)))
+        print(f">>> Elapsed time : {minute}m {second}s")
+
+    elif args.estimate == 'y':
+        print(f"\nEstimating parameters of LDA model with {args.workers} worker(s)")
+        start = time.time()
+        model = fit_model(gensim_corpus, n_topics, args.workers, args.chunksize, args.passes, args.iterations)
+        save_model(model, f"{category}-{start_date}-{end_date}", gensim_corpus, DIR_NAME, 'fit', time.time() - start)
         minute, second = list(map(int, divmod(time.time() - start, 60)))
         print(f">>> Elapsed time : {minute}m {second}s")
 
@@ -71,14 +336,25 @@ if __name__ == '__main__':
     model = LdaModel.load(datapath(f"{category}-{start_date}-{end_date}"))
     start = time.time()
 
-    topn_articles = docs_by_topic(model, gensim_corpus, n_articles)
+    theta = document_topics(model, gensim_corpus, args.chunksize)
+    np.save(os.path.join(DIR_NAME, f"doc_topic_{start_date[:6]}.npy"), theta)
+    topn_articles = docs_by_topic(theta, n_articles)
+    topn_articles['docidx'] = gensim_corpus.docids[topn_articles['docidx'].values]
     with open(os.path.join(DIR_NAME, f"topn_articles_{start_date[:6]}"), 'wb') as f:
         pickle.dump(topn_articles, f)
 
-    topn_vocabs = vocabs_by_topic(model, dictionary, n_vocabs)
+    topn_vocabs = vocabs_by_topic(model, gensim_corpus.id2word, n_vocabs)
     with open(os.path.join(DIR_NAME, f"topn_vocabs_{start_date[:6]}"), 'wb') as f:
         pickle.dump(topn_vocabs, f)
 
+    serving_path = export_serving(DIR_NAME, category, start_date[:6], topn_vocabs, topn_articles)
+    print(f">>> Serving artifact is saved as {serving_path}")
+
     minute, second = list(map(int, divmod(time.time() - start, 60)))
     print(f">>> Elapsed time : {minute}m {second}s")
-    
\ No newline at end of file
+    
+    return serving_path
+
+
+if __name__ == '__main__':
+    main()
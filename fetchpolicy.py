@@ -0,0 +1,128 @@
+import os, time, random, email.utils
+
+
+"""
+Fetch policy shared by the crawlers : connect/read timeouts, retries with jittered exponential backoff that
+honour Retry-After of HTTP 429/503, and quarantine of pages that keep failing
+encoding : UTF-8
+"""
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """
+    Page that could not be fetched within the attempts of a FetchPolicy, or that was answered with a status
+    that is not worth retrying(e.g. 404)
+    """
+    def __init__(self, url, reason):
+        super().__init__(url, reason)
+        self.url = url
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason} : {self.url}"
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait given a Retry-After header, either in seconds or an HTTP date. None if absent or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class FetchPolicy:
+    """
+    connect_timeout : seconds to establish a connection
+    read_timeout    : seconds to wait for the next bytes of a response, so that a hung socket fails instead of
+                      stalling the crawl
+    retries         : further attempts after a connection error, a timeout or a status in RETRY_STATUSES
+    backoff         : the n-th retry(from 0) waits a random time up to backoff * 2**n seconds(full jitter),
+                      at most max_backoff, or Retry-After of the response when it is given, at most max_retry_after
+    """
+    def __init__(self, connect_timeout=5.0, read_timeout=30.0, retries=4, backoff=0.5, max_backoff=30.0,
+                 max_retry_after=120.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def timeout(self):
+        """
+        timeout argument of requests.get
+        """
+        return (self.connect_timeout, self.read_timeout)
+
+    def retryable(self, status):
+        return status in RETRY_STATUSES
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to sleep before retry number attempt(from 0)
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def add_arguments(parser):
+    """
+    Command line arguments of a FetchPolicy
+    """
+    parser.add_argument('--connect-timeout', type=float, default=5.0, metavar='', help='Seconds to connect to a host')
+    parser.add_argument('--read-timeout', type=float, default=30.0, metavar='', help='Seconds to wait for bytes of a response')
+    parser.add_argument('--fetch-retries', type=int, default=4, metavar='',
+                        help='Retries of a request after a timeout, connection error, 429 or 5xx response')
+    parser.add_argument('--fetch-backoff', type=float, default=0.5, metavar='',
+                        help='Maximum seconds before the first retry of a request, doubled on each further retry')
+
+
+def from_arguments(args):
+    return FetchPolicy(args.connect_timeout, args.read_timeout, args.fetch_retries, args.fetch_backoff)
+
+
+class Quarantine:
+    """
+    Pages given up on during a run, saved as lines of url<TAB>reason so that the rest of the crawl completes and
+    they can be inspected and retried later. The file only lists failures of the last run, and is removed when
+    there are none
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+    def add(self, url, reason):
+        self.entries[url] = ' '.join(str(reason).split())
+
+    def load(self):
+        """
+        {url:reason} saved by the last run
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return dict(line.rstrip('\n').split('\t', 1) for line in f if '\t' in line)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        if not self.entries:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        with open(self.path, 'w') as f:
+            for url, reason in self.entries.items():
+                f.write(f"{url}\t{reason}\n")
@@ -0,0 +1,290 @@
+import os, json, time, sqlite3, argparse, threading
+from urllib.parse import urlsplit, urlunsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from shardstore import ShardStore
+from bowcorpus import build_bow
+from dedup import dedupe
+from daum import pageurl_template, get_datelist
+from fetchpolicy import Quarantine
+
+
+"""
+URL frontier shared by crawl workers on any number of hosts(crawlworker.py)
+Listing pages of each category and day and the articles found on them are tasks that workers lease in batches over HTTP.
+An article listed under several categories is crawled once, leases of workers that stop answering expire and
+are handed out again, and idle workers steal half of the tasks leased by the busiest worker
+encoding : UTF-8
+"""
+
+
+CATEGORIES = ['politics', 'society', 'economic', 'culture', 'entertain', 'digital', 'editorial']
+
+
+def canonical(url):
+    """
+    Article URL without query and fragment, so that links to one article from different sections compare equal
+    """
+    parts = urlsplit(url)
+    return urlunsplit(('https', parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+
+
+class Frontier:
+    """
+    Tasks in a SQLite file, so that a restarted frontier resumes where it stopped
+        tasks    : listing tasks keyed by category/date and article tasks keyed by canonical URL, with state
+                   pending, leased(to worker until expires), done or failed
+        listings : articles found on the listing of each category and day, in order
+        docs     : nouns of each article, stored once however many categories list it
+    A task leased max_attempts times without being completed is marked failed
+    """
+    def __init__(self, path, lease_seconds=60.0, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS tasks (key TEXT PRIMARY KEY, kind TEXT, category TEXT, date TEXT, '
+                        'state TEXT, worker TEXT, expires REAL, attempts INTEGER, error TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, kind)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS listings (category TEXT, date TEXT, position INTEGER, url TEXT, '
+                        'title TEXT, PRIMARY KEY (category, date, url))')
+        self.db.execute('CREATE TABLE IF NOT EXISTS docs (url TEXT PRIMARY KEY, nouns TEXT)')
+
+    def seed(self, categories, datelist):
+        """
+        Add listing tasks of every category and date that are not known yet
+        """
+        with self.lock:
+            self.db.execute('BEGIN')
+            self.db.executemany("INSERT OR IGNORE INTO tasks VALUES (?, 'listing', ?, ?, 'pending', NULL, 0, 0, NULL)",
+                                [(f"{category}/{date}", category, date) for category in categories for date in datelist])
+            self.db.execute('COMMIT')
+
+    def rows(self, keys):
+        return [dict(key=key, kind=kind, category=category, date=date) for key, kind, category, date in
+                self.db.execute(f"SELECT key, kind, category, date FROM tasks WHERE key IN ({','.join('?' * len(keys))}) "
+                                'ORDER BY rowid', keys)]
+
+    def expire(self, now):
+        self.db.execute("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                        "worker = NULL, error = COALESCE(error, 'lease expired') WHERE state = 'leased' AND expires < ?",
+                        (self.max_attempts, now))
+
+    def held(self, worker, now):
+        """
+        Extend leases of worker, which is alive, and return the keys it still holds
+        """
+        self.db.execute("UPDATE tasks SET expires = ? WHERE state = 'leased' AND worker = ?",
+                        (now + self.lease_seconds, worker))
+        return [key for key, in self.db.execute("SELECT key FROM tasks WHERE state = 'leased' AND worker = ?", (worker,))]
+
+    def lease(self, worker, n):
+        """
+        Up to n tasks for worker, listings before articles so that the frontier grows early
+        When nothing is pending, the later half of the tasks leased to the busiest other worker is stolen
+        Return {'tasks':[{key, kind, category, date}], 'finished':bool}
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.expire(now)
+            self.held(worker, now)
+            keys = [key for key, in self.db.execute("SELECT key FROM tasks WHERE state = 'pending' "
+                                                    'ORDER BY kind DESC, rowid LIMIT ?', (n,))]
+            if keys:
+                self.db.executemany("UPDATE tasks SET state = 'leased', worker = ?, expires = ?, attempts = attempts + 1 "
+                                    'WHERE key = ?', [(worker, now + self.lease_seconds, key) for key in keys])
+            else:
+                busiest = self.db.execute("SELECT worker, COUNT(*) AS n FROM tasks WHERE state = 'leased' AND worker != ? "
+                                          'GROUP BY worker ORDER BY n DESC LIMIT 1', (worker,)).fetchone()
+                if busiest and busiest[1] > 1:
+                    keys = [key for key, in self.db.execute("SELECT key FROM tasks WHERE state = 'leased' AND worker = ? "
+                                                            'ORDER BY rowid DESC LIMIT ?', (busiest[0], min(n, busiest[1] // 2)))]
+                    self.db.executemany('UPDATE tasks SET worker = ?, expires = ? WHERE key = ?',
+                                        [(worker, now + self.lease_seconds, key) for key in keys])
+            finished = not keys and not self.db.execute("SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0]
+            self.db.execute('COMMIT')
+            return dict(tasks=self.rows(keys) if keys else [], finished=finished)
+
+    def complete(self, worker, key, result):
+        """
+        Store the result of a task, {'urls', 'titles'} of a listing or {'nouns'} of an article
+        The first completion of a task counts, even if its lease expired or was stolen meanwhile
+        Return {'leased':[keys still leased to worker]}
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            row = self.db.execute('SELECT kind, category, date, state FROM tasks WHERE key = ?', (key,)).fetchone()
+            if row and row[3] != 'done':
+                kind, category, date, _ = row
+                if kind == 'listing':
+                    self.db.executemany('INSERT OR IGNORE INTO listings VALUES (?, ?, ?, ?, ?)',
+                                        [(category, date, position, canonical(url), title) for position, (url, title)
+                                         in enumerate(zip(result['urls'], result['titles']))])
+                    self.db.executemany("INSERT OR IGNORE INTO tasks VALUES (?, 'article', NULL, NULL, 'pending', NULL, 0, 0, NULL)",
+                                        [(canonical(url),) for url in result['urls']])
+                else:
+                    self.db.execute('INSERT OR REPLACE INTO docs VALUES (?, ?)', (key, json.dumps(result['nouns'], ensure_ascii=False)))
+                self.db.execute("UPDATE tasks SET state = 'done', worker = NULL, error = NULL WHERE key = ?", (key,))
+            leased = self.held(worker, now)
+            self.db.execute('COMMIT')
+            return dict(leased=leased)
+
+    def fail(self, worker, key, error=None):
+        """
+        Put a task that worker could not complete back in the queue, or mark it failed after max_attempts
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.execute("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                            "worker = NULL, error = ? WHERE key = ? AND state = 'leased' AND worker = ?",
+                            (self.max_attempts, error, key, worker))
+            leased = self.held(worker, now)
+            self.db.execute('COMMIT')
+            return dict(leased=leased)
+
+    def stats(self):
+        """
+        Number of tasks of each kind in each state, workers holding leases and articles listed more than once
+        """
+        with self.lock:
+            tasks = {}
+            for kind, state, n in self.db.execute('SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state'):
+                tasks.setdefault(kind, {})[state] = n
+            workers = self.db.execute("SELECT COUNT(DISTINCT worker) FROM tasks WHERE state = 'leased'").fetchone()[0]
+            listed, distinct = self.db.execute('SELECT COUNT(*), COUNT(DISTINCT url) FROM listings').fetchone()
+            return dict(tasks=tasks, workers=workers, duplicates=listed - distinct)
+
+    def export(self, category, datelist, dirname):
+        """
+        Write urllist.txt, titlelist.txt and shards of articles of category listed on datelist into dirname,
+        in the layout of getcorpus.py, and failed listings and articles into failed_urls.txt. Return ShardStore of the corpus
+        """
+        os.makedirs(dirname, exist_ok=True)
+        store = ShardStore(dirname)
+        store.reset()
+        with self.lock:
+            rows = []
+            for start in range(0, len(datelist), 500):
+                chunk = datelist[start:start + 500]
+                rows += self.db.execute('SELECT listings.url, title, nouns FROM listings LEFT JOIN docs ON listings.url = docs.url '
+                                        f"WHERE category = ? AND date IN ({','.join('?' * len(chunk))}) ORDER BY date, position",
+                                        [category] + chunk).fetchall()
+            quarantine = Quarantine(os.path.join(dirname, 'failed_urls.txt'))
+            keys = [f"{category}/{date}" for date in datelist] + [url for url, _, nouns in rows if nouns is None]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                for key, kind, date, error in self.db.execute("SELECT key, kind, date, error FROM tasks WHERE state = 'failed' "
+                                                              f"AND key IN ({','.join('?' * len(chunk))})", chunk):
+                    quarantine.add(pageurl_template(category, 1, date) if kind == 'listing' else key, error)
+            quarantine.save()
+        with open(os.path.join(dirname, 'urllist.txt'), 'w') as f_url, \
+             open(os.path.join(dirname, 'titlelist.txt'), 'w') as f_title:
+            for idx, (url, title, nouns) in enumerate(rows):
+                f_url.write(url + '\n')
+                f_title.write(title + '\n')
+                if nouns is not None:
+                    store.append(idx, json.loads(nouns))
+        store.close()
+        return store
+
+
+class FrontierHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP : POST /lease {worker, n}, /complete {worker, key, result}, /fail {worker, key, error}, GET /stats
+    """
+    frontier = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        if self.path == '/lease':
+            self.respond(200, self.frontier.lease(request['worker'], request.get('n', 16)))
+        elif self.path == '/complete':
+            self.respond(200, self.frontier.complete(request['worker'], request['key'], request['result']))
+        elif self.path == '/fail':
+            self.respond(200, self.frontier.fail(request['worker'], request['key'], request.get('error')))
+        else:
+            self.respond(404, {})
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.respond(200, self.frontier.stats())
+        else:
+            self.respond(404, {})
+
+    def respond(self, status, reply):
+        body = json.dumps(reply, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def progress(stats):
+    listing, article = stats['tasks'].get('listing', {}), stats['tasks'].get('article', {})
+    return (f">>> frontier : days {listing.get('done', 0)}/{sum(listing.values())}, "
+            f"articles {article.get('done', 0)}/{sum(article.values())} ({article.get('failed', 0)} failed), "
+            f"{stats['duplicates']} listed twice, {stats['workers']} workers")
+
+
+def export_corpora(frontier, categories, start, end):
+    """
+    Corpus of each category under dirs/{category}-{start}-{end}, deduplicated and converted to bag of words
+    like the output of getcorpus.py
+    """
+    datelist = get_datelist(start, end)
+    for category in categories:
+        dirname = os.path.join('./dirs', f"{category}-{start}-{end}")
+        store = frontier.export(category, datelist, dirname)
+        n_docs = build_bow(dedupe(store.records(), dirname), os.path.join(dirname, 'bow'))
+        print(f">>> Corpus of {n_docs} articles is saved in {dirname}")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve a URL frontier of listings and articles to crawlworker.py processes')
+    parser.add_argument('-c', '--categories', nargs='+', choices=CATEGORIES, default=CATEGORIES, metavar='',
+                        help='Categories of articles. Defaults to all seven')
+    parser.add_argument('-s', '--start-date', required=True, metavar='', help='Initial date of publishment')
+    parser.add_argument('-e', '--end-date', required=True, metavar='', help='Final date of publishment')
+    parser.add_argument('--db', default='./dirs/frontier.sqlite', metavar='', help='SQLite file of the frontier')
+    parser.add_argument('--host', default='0.0.0.0', metavar='', help='Address to listen on')
+    parser.add_argument('-p', '--port', type=int, default=8900, metavar='', help='Port to listen on')
+    parser.add_argument('--lease', type=float, default=60.0, metavar='',
+                        help='Seconds after which tasks of a worker that stopped answering are handed out again')
+    parser.add_argument('--max-attempts', type=int, default=3, metavar='', help='Leases of a task before it is marked failed')
+    parser.add_argument('--linger', type=float, default=10.0, metavar='',
+                        help='Seconds to keep serving after every task is done, so that workers learn that they can stop')
+    parser.add_argument('--export-only', action='store_true', help='Only write corpora of what the frontier has crawled so far')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    frontier = Frontier(args.db, args.lease, args.max_attempts)
+    if not args.export_only:
+        frontier.seed(args.categories, get_datelist(args.start_date, args.end_date))
+        FrontierHandler.frontier = frontier
+        ThreadingHTTPServer.request_queue_size = 1024
+        server = ThreadingHTTPServer((args.host, args.port), FrontierHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f">>> Serving frontier {args.db} on http://{args.host}:{args.port}")
+
+        time_started = time.time()
+        while True:
+            stats = frontier.stats()
+            print('\r' + progress(stats), end='', flush=True)
+            if not any(stats['tasks'].get(kind, {}).get(state) for kind in ['listing', 'article'] for state in ['pending', 'leased']):
+                break
+            time.sleep(1.0)
+        minutes, seconds = list(map(int, divmod(time.time() - time_started, 60)))
+        print(f"\n>>> Every task is done in {minutes}m {seconds}s")
+        time.sleep(args.linger)
+        server.shutdown()
+
+    export_corpora(frontier, args.categories, args.start_date, args.end_date)
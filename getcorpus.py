@@ -1,6 +1,13 @@
-import os, sys, requests, argparse, datetime, re, ray, time, pickle
-from bs4 import BeautifulSoup
-from konlpy.tag import Mecab
+import os, sys, argparse, datetime, re, ray, time, asyncio, shutil, tempfile
+from collections import deque
+from daum import pageurl_template, rewrite_host, get_datelist, parse_listing, set_extractor, scrape_day
+import asyncfetch, pipeline, httpcache, metrics, fetchpolicy
+from fetchpolicy import Quarantine
+from tokenizer import TokenizerPool, report
+from shardstore import ShardStore
+from bowcorpus import build_bow
+from dedup import dedupe, load_duplicates
+from daystore import DayStore, DayRouter, assemble
 
 
 """
@@ -18,99 +25,249 @@ parser.add_argument('-c', '--category', metavar='',
                     help='Category of articles whose URLs are to be scraped')
 parser.add_argument('-s', '--start-date',  metavar='', help='Initial date of publishment')
 parser.add_argument('-e', '--end-date',  metavar='', help='Final date of publishment')
-args = parser.parse_args()
+parser.add_argument('--engine', choices=['ray', 'async', 'pipeline'], default='ray',
+                    help="Fetch engine. 'ray' runs one task per page, 'async' fetches every page from one asyncio client, "
+                         "'pipeline' runs fetch, extraction and tokenization as separate stages")
+parser.add_argument('--max-inflight', type=int, default=200, metavar='', help='Maximum concurrent requests of async/pipeline engine')
+parser.add_argument('--host-rate', type=float, default=20.0, metavar='', help='Maximum requests per second to each host of async/pipeline engine')
+parser.add_argument('--extract-workers', type=int, default=2, metavar='', help='Number of HTML extraction processes of pipeline engine')
+parser.add_argument('--tokenize-workers', type=int, metavar='', help='Number of Mecab processes. Defaults to number of cores - 1')
+parser.add_argument('--tokenize-batch', type=int, default=64, metavar='', help='Number of articles sent to a Mecab process at once by ray/async engine')
+parser.add_argument('--paragraphs', action='store_true', help='Tag each paragraph of an article separately in the same call')
+parser.add_argument('--memo', action='store_true',
+                    help='Tokenize identical paragraphs once, sharing results between Mecab processes of ray/async engine')
+parser.add_argument('--memo-path', metavar='', help='SQLite file keeping memoized paragraphs between runs. Implies --memo')
+parser.add_argument('--memo-size', type=int, default=200000, metavar='', help='Maximum number of memoized paragraphs')
+parser.add_argument('--window', type=int, default=1000, metavar='', help='Maximum fetch tasks of ray engine in flight at once')
+parser.add_argument('--queue-size', type=int, default=1000, metavar='', help='Capacity of each queue between stages of pipeline engine')
+parser.add_argument('--base-url', metavar='', help='Send every request to this host instead, e.g. http://127.0.0.1:8765 for daum_standin.py')
+parser.add_argument('--incremental', action='store_true',
+                    help="Keep URLs, titles and nouns per day under dirs/days and only crawl days that are new or incomplete. "
+                         "With 'y', listings of every day are scraped again to find new articles")
+parser.add_argument('--cache', metavar='', help='Directory of local response cache of listing and article pages. Not used if omitted')
+parser.add_argument('--cache-size', type=int, default=2048, metavar='', help='Maximum size of response cache in MB')
+parser.add_argument('--cache-mode', choices=['reuse', 'revalidate'], default='reuse',
+                    help="'reuse' serves cached pages without network traffic, 'revalidate' sends conditional GETs")
+parser.add_argument('--discovery', choices=['adaptive', 'serial'], default='adaptive',
+                    help="'adaptive' searches the number of listing pages of a day and fetches them concurrently, "
+                         "'serial' walks listing pages one by one")
+parser.add_argument('--probes', type=int, default=8, metavar='', help='Listing pages fetched at once while searching the number of pages')
+parser.add_argument('--extractor', choices=['bs4', 'lxml'], metavar='',
+                    help="HTML extractor, 'bs4'(html.parser) or 'lxml'. Defaults to lxml when it is installed")
+parser.add_argument('--metrics-port', type=int, metavar='', help='Serve metrics of the crawl at http://HOST:PORT/metrics in Prometheus text format')
+parser.add_argument('--no-dedup', action='store_true', help='Keep near-duplicate articles republished by several publishers')
+fetchpolicy.add_arguments(parser)
+args = None
 
-paper_publishers = ['한국일보','문화일보','동아일보','서울신문','세계일보','경향신문','국민일보','중앙일보','한겨레','조선일보']
 
-
-def date_formatting(date):
+@ray.remote
+def get_url_title(category, date, base_url=None, cache_options=None, probes=None, submitted=None, policy=None,
+                  metrics_dir=None):
     """
-    Convert datetime.date object into yyyymmdd format string
+    Get list of valid URL of articles and their title that corresponds to certain input date
+    With probes, listing pages are fetched with up to `probes` threads(daum.scrape_day)
+    If a listing page cannot be fetched or parsed, whatever the error, the day is empty and has the reason in 'failed'
+    metrics_dir is the metrics directory of the crawl, as a Ray worker may run tasks of several crawls(batch.py)
     """
-    year = str(date.year)
-    month = str(date.month).rjust(2, '0')
-    day = str(date.day).rjust(2, '0')
-    return year + month + day
+    metrics.use(metrics_dir)
+    if submitted:
+        metrics.observe('schedule', time.time() - submitted)
+    cache = httpcache.open_cache(**(cache_options or {}))
+    def fetch(pagenum):
+        url = rewrite_host(pageurl_template(category, pagenum, date), base_url)
+        return parse_listing(httpcache.get_text(url, cache, policy))
+
+    try:
+        url_title = scrape_day(fetch, probes)
+    except Exception as error:
+        url_title = dict(urls=[], titles=[], failed=f"{type(error).__name__}: {error}")
+    metrics.flush(force=True)
+    return url_title
 
 
-def get_datelist(start, end):
+@ray.remote
+def fetch_article(url, base_url=None, cache_options=None, submitted=None, policy=None, metrics_dir=None):
     """
-    Given start, end date in yyyymmdd format, obtain list of dates(yyyymmdd) in between
+    Download article page that corresponds to input URL
+    submitted is the time the task was submitted, to measure how long it waited for a worker
+    metrics_dir is the metrics directory of the crawl, as in get_url_title
     """
-    assert len(start) == 8, 'start date not in proper format: yyyymmdd'
-    assert len(end) == 8, 'end date not in proper format: yyyymmdd'
-    
-    start_list = [start[:4], start[4:6], start[6:]]
-    end_list = [end[:4], end[4:6], end[6:]]
-    
-    start_date = datetime.date(*list(map(int, start_list)))
-    end_date = datetime.date(*list(map(int, end_list)))
-    delta = (end_date - start_date).days
-    assert delta >= 0, 'start date must precede end date'
-    
-    date_list = [start_date + datetime.timedelta(d) for d in range(delta+1)]
-    return list(map(date_formatting, date_list))
+    metrics.use(metrics_dir)
+    if submitted:
+        metrics.observe('schedule', time.time() - submitted)
+    cache = httpcache.open_cache(**(cache_options or {}))
+    html = httpcache.get_text(rewrite_host(url, base_url), cache, policy)
+    metrics.flush(force=True)
+    return html
 
 
-def pageurl_template(category, pagenum, date):
+def store_docs(store, docs):
     """
-    Function to return formatted URL given category, page number, date
+    Append (index, nouns) to store, returning indexes of articles that could not be parsed(nouns is None)
     """
-    assert len(str(date)) == 8, 'Invalid input date format'
-    return f"https://news.daum.net/breakingnews/{category}?page={pagenum}&regDate={date}"
+    failed = []
+    for idx, nouns in docs:
+        if nouns is None:
+            failed.append(idx)
+            metrics.count('failed')
+            continue
+        store.append(idx, nouns)
+        metrics.count('documents')
+    return failed
 
 
-@ray.remote
-def get_url_title(category, date):
+def collect(urllist, remaining, store, tokenizers, window=1000):
     """
-    Get list of valid URL of articles and their title that corresponds to certain input date
+    Fetch articles of urllist at indexes in remaining with at most `window` ray tasks in flight, handing pages
+    of finished tasks to tokenizers and appending nouns to store as batches finish
+    Fetches are retried inside the task by the FetchPolicy, so an article whose task failed or whose page could
+    not be parsed is not submitted again. Return {index:reason} of those articles, which are left for the next run
     """
-    pagenum = 1
-    url_title = dict({'urls':[], 'titles':[]})
+    queue = deque(remaining)
+    jobs = {}
+    tokenizing = {}
+    failed = {}
 
-    while True:
-        response = requests.get(pageurl_template(category, pagenum, date))
-        parsed = BeautifulSoup(response.text, 'html.parser')
-        body = parsed.find('div', attrs={'class':'box_etc'})
+    def handle(docs):
+        store_docs(store, [(idx, nouns) for idx, nouns in docs if nouns is not None])
+        for idx, nouns in docs:
+            ref = tokenizing.pop(idx)
+            if nouns is None:
+                failed[idx] = failure(ref)
+                metrics.count('failed')
 
-        if body.select('p.txt_none'):
-            break
+    while queue or jobs or tokenizers.refs or tokenizers.batch:
+        while len(jobs) < window and queue:
+            idx = queue.popleft()
+            jobs[fetch_article.remote(urllist[idx], args.base_url, cache_options(), time.time(), fetch_policy(),
+                                      metrics.registry.dirname)] = idx
+        if jobs:
+            done, _ = ray.wait(list(jobs), num_returns=min(len(jobs), 100), timeout=1.0)
+            for ref in done:
+                tokenizing[jobs[ref]] = ref
+                tokenizers.submit(jobs.pop(ref), ref)
+            handle(tokenizers.ready())
         else:
-            articles = body.select('div.cont_thumb')
-            for tag in articles:
-                publisher = tag.find('span', attrs={'class':'info_news'}).get_text().split()[0]
-                if publisher in paper_publishers:
-                    a_tag = tag.find('a')
-                    url_title['urls'].append(a_tag['href'])
-                    url_title['titles'].append(a_tag.get_text())
-            pagenum += 1
-        
-    return url_title
+            handle(list(tokenizers.drain()))
+    return failed
 
 
-@ray.remote
-def extract_nouns(url):
+def failure(ref):
     """
-    Extract nouns from the body text of article that corresponds to input URL using konlpy.Mecab
+    Reason why the article of a fetch task was not tokenized : the last line of the error of the task if it failed
     """
-    time.sleep(0.05)
-    response = requests.get(url)
-    parsed = BeautifulSoup(response.text, 'html.parser')
-    body = parsed.find('div', attrs={'class':'news_view'})
-    text_tags = body.find_all('p', attrs={'dmcf-ptype':'general'})
-    text = ' '.join([tag.get_text().strip() 
-                    for tag in text_tags 
-                    if '@' not in tag.get_text() and len(tag.get_text()) > 8])
+    try:
+        ray.get(ref)
+    except Exception as error:
+        return str(error).strip().splitlines()[-1]
+    return 'page could not be parsed'
 
-    pattern = re.compile("[\[(].{1,20}[\])]")
-    nouns = [word 
-            for word in mecab.nouns(pattern.sub('', text)) 
-            if len(word) > 1]
 
-    return nouns
+def cache_options():
+    """
+    Keyword arguments of httpcache.open_cache given by command line
+    """
+    return dict(dirname=args.cache, max_bytes=args.cache_size * 1024**2, mode=args.cache_mode)
 
 
-if __name__ == '__main__':
+def probes():
+    """
+    Concurrent listing pages per round of page count search, or None to walk listing pages one by one
+    """
+    return args.probes if args.discovery == 'adaptive' else None
+
+
+def fetch_policy():
+    """
+    fetchpolicy.FetchPolicy of timeouts and retries given by command line
+    """
+    return fetchpolicy.from_arguments(args)
+
+
+def fetch_options():
+    """
+    Keyword arguments of asyncfetch.AsyncFetcher given by command line
+    """
+    return dict(max_inflight=args.max_inflight, host_rate=args.host_rate, base_url=args.base_url,
+                cache=httpcache.open_cache(**cache_options()), policy=fetch_policy())
+
+
+def scrape_url_titles(category, datelist):
+    """
+    Get url_title dicts of every date in datelist with the engine given by command line
+    Days whose listing could not be scraped have the reason in 'failed'
+    """
+    if args.engine in ['async', 'pipeline']:
+        return asyncio.run(asyncfetch.get_url_titles(category, datelist, probes(), **fetch_options()))
+    joblist = [get_url_title.remote(category, date, args.base_url, cache_options(), probes(), time.time(), fetch_policy(),
+                                     metrics.registry.dirname)
+               for date in datelist]
+    return ray.get(joblist)
+
+
+def crawl_articles(urllist, remaining, store, quarantine, actors=None):
+    """
+    Extract nouns from articles of urllist at indexes in remaining with the engine given by command line,
+    appending them to store as they finish. Return tokens/sec statistics of Mecab workers of ray/async engine
+    Articles that could not be fetched or parsed are added to quarantine
+    actors are Tokenizer actors to reuse instead of starting new ones
+    """
+    if args.engine == 'pipeline':
+        with metrics.Progress(len(remaining)):
+            failed = pipeline.run_pipeline([(idx, urllist[idx]) for idx in remaining], store,
+                                             fetch_workers=args.max_inflight,
+                                             extract_workers=args.extract_workers,
+                                             tokenize_workers=args.tokenize_workers,
+                                             queue_size=args.queue_size,
+                                             fetch_options=dict(host_rate=args.host_rate, base_url=args.base_url,
+                                                                cache=httpcache.open_cache(**cache_options()),
+                                                                policy=fetch_policy()))
+        for idx, reason in failed.items():
+            quarantine.add(urllist[idx], reason)
+        return []
+
+    memo_dir = None
+    memo = None
+    if args.memo_path:
+        memo = dict(path=args.memo_path, max_entries=args.memo_size)
+    elif args.memo:
+        memo_dir = tempfile.mkdtemp(prefix='memo-')
+        memo = dict(path=os.path.join(memo_dir, 'memo.sqlite'), max_entries=args.memo_size)
+
+    tokenizers = TokenizerPool(args.tokenize_workers, args.tokenize_batch, args.paragraphs, memo, actors)
+    with metrics.Progress(len(remaining)):
+        if args.engine == 'async':
+            def submit(idx, html, error=None):
+                if html is None:
+                    quarantine.add(urllist[remaining[idx]], error)
+                    metrics.count('failed')
+                    return
+                tokenizers.submit(remaining[idx], html)
+                for job in store_docs(store, tokenizers.ready()):
+                    quarantine.add(urllist[job], 'page could not be parsed')
+            asyncio.run(asyncfetch.fetch_pages([urllist[idx] for idx in remaining], submit, **fetch_options()))
+            for job in store_docs(store, tokenizers.drain()):
+                quarantine.add(urllist[job], 'page could not be parsed')
+        else:
+            failed = collect(urllist, remaining, store, tokenizers, args.window)
+            for idx, reason in failed.items():
+                quarantine.add(urllist[idx], reason)
+    stats = tokenizers.stats()
+    report(stats)
+    if memo_dir:
+        shutil.rmtree(memo_dir, ignore_errors=True)
+    return stats
+
+
+def main(argv=None, actors=None):
+    """
+    Run getcorpus with command line arguments argv, reusing Tokenizer actors and the Ray connection if given
+    Return directory of the corpus and number of documents in it
+    """
+    global args
+    args = parser.parse_args(argv)
+    assert not (actors and (args.memo or args.memo_path)), \
+        '--memo and --memo-path are not supported with shared Tokenizer actors(batch.py)'
 
     DIR_HOME = './dirs'
     if not os.path.exists('./dirs'):
@@ -120,47 +277,114 @@ if __name__ == '__main__':
     end = args.end_date
     DIR_NAME = os.path.join(DIR_HOME, f"{category}-{start}-{end}")
     time_started = time.time()
-    ray.init(ignore_reinit_error=True)
+    if args.extractor:
+        set_extractor(args.extractor)
+    metrics.configure(os.path.join(DIR_NAME, 'metrics'))
+    if args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port)
+    if args.engine != 'pipeline':
+        if not ray.is_initialized():
+            ray.init()
+    quarantine = Quarantine(os.path.join(DIR_NAME, 'failed_urls.txt'))
 
-
-    if args.geturllist == 'y':
-        if not os.path.exists(DIR_NAME):
-            os.mkdir(DIR_NAME)
-        datelist = get_datelist(start, end)
+    if args.incremental:
         assert category, 'Category of articles is not specified'
-        print(f"\nSaving valid URLs into urllist: {category}, from {start[:4]}-{start[4:6]}-{start[6:]} to {end[:4]}-{end[4:6]}-{end[6:]}")
-
-        joblist = [get_url_title.remote(category, date) for date in datelist]
-        url_titles = ray.get(joblist)
-        urllist = []
-        titlelist = []
-        for url_title in url_titles:
-            urllist += url_title['urls']
-            titlelist += url_title['titles']
-
-        with open(os.path.join(DIR_NAME, 'urllist.txt'), 'w') as f:
-            for url in urllist:
-                f.write(url + '\n')
-        print(f">>> List of valid URLs is saved as {DIR_NAME + '/urllist.txt'}\n")
-
-        with open(os.path.join(DIR_NAME, 'titlelist.txt'), 'w') as f:
-            for title in titlelist:
-                f.write(title + '\n')
-    
-
-    print("Extracting words from articles in the urllist")
-    with open(os.path.join(DIR_NAME, 'urllist.txt'), 'r') as f:
-        urls = f.read()
-
-    urllist = urls.split()
-    mecab = Mecab()
-    joblist = [extract_nouns.remote(url) for url in urllist]
-    corpus = ray.get(joblist)
-
-    with open(os.path.join(DIR_NAME, 'corpus'), 'wb') as f:
-        pickle.dump(corpus, f)
+        days = [DayStore(DIR_HOME, category, date) for date in get_datelist(start, end)]
+        unlisted = [day for day in days if args.geturllist == 'y' or not day.listed()]
+        print(f"\nScraping valid URLs of {len(unlisted)} out of {len(days)} days: {category}, from {start[:4]}-{start[4:6]}-{start[6:]} to {end[:4]}-{end[4:6]}-{end[6:]}")
+        for day, url_title in zip(unlisted, scrape_url_titles(category, [day.date for day in unlisted])):
+            if 'failed' in url_title:
+                quarantine.add(pageurl_template(category, 1, day.date), url_title['failed'])
+                continue
+            day.merge_listing(url_title)
+
+        router = DayRouter(days)
+        print(f"Extracting words from {len(router.urllist)} articles that are not stored yet")
+        tokenizer_stats = crawl_articles(router.urllist, range(len(router.urllist)), router, quarantine, actors)
+        router.close()
+        store = assemble(days, DIR_NAME)
+        print(f">>> Days are assembled into {DIR_NAME}")
+
+    else:
+        store = ShardStore(DIR_NAME)
+
+        if args.geturllist == 'y':
+            if not os.path.exists(DIR_NAME):
+                os.mkdir(DIR_NAME)
+            datelist = get_datelist(start, end)
+            assert category, 'Category of articles is not specified'
+            print(f"\nSaving valid URLs into urllist: {category}, from {start[:4]}-{start[4:6]}-{start[6:]} to {end[:4]}-{end[4:6]}-{end[6:]}")
+
+            url_titles = scrape_url_titles(category, datelist)
+            urllist = []
+            titlelist = []
+            for date, url_title in zip(datelist, url_titles):
+                if 'failed' in url_title:
+                    quarantine.add(pageurl_template(category, 1, date), url_title['failed'])
+                urllist += url_title['urls']
+                titlelist += url_title['titles']
+
+            urllist_path = os.path.join(DIR_NAME, 'urllist.txt')
+            if os.path.exists(urllist_path):
+                with open(urllist_path, 'r') as f:
+                    old_urls = f.read().split()
+                if old_urls != urllist:
+                    store.remap(old_urls, urllist)
+
+            with open(urllist_path, 'w') as f:
+                for url in urllist:
+                    f.write(url + '\n')
+            print(f">>> List of valid URLs is saved as {DIR_NAME + '/urllist.txt'}\n")
+
+            with open(os.path.join(DIR_NAME, 'titlelist.txt'), 'w') as f:
+                for title in titlelist:
+                    f.write(title + '\n')
+
+
+        else:
+            for url, reason in quarantine.load().items():
+                if '/breakingnews/' in url:
+                    quarantine.add(url, reason)
+
+        print("Extracting words from articles in the urllist")
+        with open(os.path.join(DIR_NAME, 'urllist.txt'), 'r') as f:
+            urls = f.read()
+
+        urllist = urls.split()
+        remaining = store.remaining(len(urllist))
+        if len(remaining) < len(urllist):
+            print(f">>> Resuming : {len(urllist) - len(remaining)} of {len(urllist)} articles are already stored")
+        tokenizer_stats = crawl_articles(urllist, remaining, store, quarantine, actors)
+        store.close()
+
+    records = store.records()
+    if args.no_dedup:
+        if os.path.exists(os.path.join(DIR_NAME, 'duplicates.json')):
+            os.remove(os.path.join(DIR_NAME, 'duplicates.json'))
+    else:
+        with metrics.timer('dedup'):
+            records = dedupe(records, DIR_NAME)
+        n_duplicates = sum(len(duplicates) for duplicates in load_duplicates(DIR_NAME).values())
+        print(f">>> {n_duplicates} near-duplicate articles are left out, see {DIR_NAME + '/duplicates.json'}")
+    with metrics.timer('bow'):
+        n_docs = build_bow(records, os.path.join(DIR_NAME, 'bow'))
+
+    quarantine.save()
+    if quarantine:
+        print(f">>> {len(quarantine)} pages failed and are listed in {quarantine.path}. "
+              f"Run again to retry them{'' if args.incremental else ', with y for listing pages'}")
 
     minutes, seconds = list(map(int, divmod(time.time() - time_started, 60)))
-    print(f">>> Corpus of articles is saved as {DIR_NAME + '/corpus'}")
+    print(f">>> Corpus of {n_docs} articles is saved in {store.dirname} and {DIR_NAME + '/bow'}")
     print(f">>> Total elapsed time : {str(minutes).rjust(3)}m {str(seconds).rjust(2,'0')}s")
-    
\ No newline at end of file
+
+    report_path = os.path.join(DIR_NAME, 'run_report.json')
+    metrics.write_report(report_path, args=vars(args), started=datetime.datetime.fromtimestamp(time_started),
+                         elapsed=time.time() - time_started, n_docs=n_docs, n_failed=len(quarantine),
+                         tokenizers=tokenizer_stats)
+    print(f">>> Metrics of each stage are saved in {report_path}")
+    return dict(dirname=DIR_NAME, n_docs=n_docs)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
-import os, sys, requests, argparse, datetime, re, time, pickle
-from collections import Counter, defaultdict
+import os, sys, argparse, datetime, re, time, httpcache, fetchpolicy
 from bs4 import BeautifulSoup
 from konlpy.tag import Mecab
+from shardstore import ShardStore
+from bowcorpus import build_bow
+from dedup import dedupe, load_duplicates
+from daum import PageError
+from fetchpolicy import Quarantine
 
 
 """
@@ -19,6 +23,12 @@ parser.add_argument('-c', '--category', metavar='',
                     help='Category of articles whose URLs are to be scraped')
 parser.add_argument('-s', '--start-date',  metavar='', help='Initial date of publishment')
 parser.add_argument('-e', '--end-date',  metavar='', help='Final date of publishment')
+parser.add_argument('--cache', metavar='', help='Directory of local response cache of listing and article pages. Not used if omitted')
+parser.add_argument('--cache-size', type=int, default=2048, metavar='', help='Maximum size of response cache in MB')
+parser.add_argument('--cache-mode', choices=['reuse', 'revalidate'], default='reuse',
+                    help="'reuse' serves cached pages without network traffic, 'revalidate' sends conditional GETs")
+parser.add_argument('--no-dedup', action='store_true', help='Keep near-duplicate articles republished by several publishers')
+fetchpolicy.add_arguments(parser)
 args = parser.parse_args()
 
 paper_publishers = ['한국일보','문화일보','동아일보','서울신문','세계일보','경향신문','국민일보','중앙일보','한겨레','조선일보']
@@ -69,9 +79,10 @@ def get_url_title(category, date):
     url_title = dict({'urls':[], 'titles':[]})
 
     while True:
-        response = requests.get(pageurl_template(category, pagenum, date))
-        parsed = BeautifulSoup(response.text, 'html.parser')
+        parsed = BeautifulSoup(httpcache.get_text(pageurl_template(category, pagenum, date), cache, policy), 'html.parser')
         body = parsed.find('div', attrs={'class':'box_etc'})
+        if body is None:
+            raise PageError('listing page without div.box_etc')
 
         if body.select('p.txt_none'):
             break
@@ -94,9 +105,10 @@ def extract_nouns(url):
     Extract nouns from the body text of article that corresponds to input URL using konlpy.Mecab
     """
     time.sleep(0.05)
-    response = requests.get(url)
-    parsed = BeautifulSoup(response.text, 'html.parser')
+    parsed = BeautifulSoup(httpcache.get_text(url, cache, policy), 'html.parser')
     body = parsed.find('div', attrs={'class':'news_view'})
+    if body is None:
+        raise PageError('article page without div.news_view')
     text_tags = body.find_all('p', attrs={'dmcf-ptype':'general'})
     text = ' '.join([tag.get_text().strip() 
                     for tag in text_tags 
@@ -119,6 +131,10 @@ if __name__ == '__main__':
     end = args.end_date
     DIR_NAME = os.path.join(DIR_HOME, f"{category}-{start}-{end}")
     time_started = time.time()
+    store = ShardStore(DIR_NAME)
+    cache = httpcache.open_cache(args.cache, args.cache_size * 1024**2, args.cache_mode)
+    policy = fetchpolicy.from_arguments(args)
+    quarantine = Quarantine(os.path.join(DIR_NAME, 'failed_urls.txt'))
 
 
     if args.geturllist == 'y':
@@ -132,7 +148,11 @@ if __name__ == '__main__':
         urllist = []
         titlelist = []
         for date in datelist:
-            url_title = get_url_title(category, date)
+            try:
+                url_title = get_url_title(category, date)
+            except Exception as error:
+                quarantine.add(pageurl_template(category, 1, date), f"{type(error).__name__}: {error}")
+                continue
             urllist += url_title['urls']
             titlelist += url_title['titles']
             
@@ -141,7 +161,14 @@ if __name__ == '__main__':
             sys.stdout.flush()
 
         print('\n')
-        with open(os.path.join(DIR_NAME, 'urllist.txt'), 'w') as f:
+        urllist_path = os.path.join(DIR_NAME, 'urllist.txt')
+        if os.path.exists(urllist_path):
+            with open(urllist_path, 'r') as f:
+                old_urls = f.read().split()
+            if old_urls != urllist:
+                store.remap(old_urls, urllist)
+
+        with open(urllist_path, 'w') as f:
             for url in urllist:
                 f.write(url + '\n')
 
@@ -149,6 +176,10 @@ if __name__ == '__main__':
             for title in titlelist:
                 f.write(title + '\n')
 
+    else:
+        for url, reason in quarantine.load().items():
+            if '/breakingnews/' in url:
+                quarantine.add(url, reason)
 
     print("Extracting words from articles in the urllist")
 
@@ -156,23 +187,37 @@ if __name__ == '__main__':
         urls = f.read()
 
     urllist = urls.split()
-    article2idx = defaultdict(lambda: len(article2idx))
-    word2idx = defaultdict(lambda: len(word2idx))
     mecab = Mecab()
-    corpus = []
-    n_url = len(urllist)
-
-    for idx, url in enumerate(urllist, 1):
-        corpus += extract_nouns(url)
+    remaining = store.remaining(len(urllist))
+    n_url = len(remaining)
+    if n_url < len(urllist):
+        print(f">>> Resuming : {len(urllist) - n_url} of {len(urllist)} articles are already stored")
+
+    for progress, idx in enumerate(remaining, 1):
+        try:
+            store.append(idx, extract_nouns(urllist[idx]))
+        except Exception as error:
+            quarantine.add(urllist[idx], f"{type(error).__name__}: {error}")
         
         sys.stdout.write('\r')
-        sys.stdout.write(f">>> progress : [{('='*(int(idx/n_url*100) // 5)).ljust(20)}]")
+        sys.stdout.write(f">>> progress : [{('='*(int(progress/n_url*100) // 5)).ljust(20)}]")
         sys.stdout.flush()
-
-    with open(os.path.join(DIR_NAME, 'corpus'), 'wb') as f:
-        pickle.dump(corpus, f)
+    store.close()
+    quarantine.save()
+    if quarantine:
+        print(f"\n>>> {len(quarantine)} pages failed and are listed in {quarantine.path}. "
+              f"Run again to retry them, with y for listing pages")
+    records = store.records()
+    if args.no_dedup:
+        if os.path.exists(os.path.join(DIR_NAME, 'duplicates.json')):
+            os.remove(os.path.join(DIR_NAME, 'duplicates.json'))
+    else:
+        records = dedupe(records, DIR_NAME)
+        n_duplicates = sum(len(duplicates) for duplicates in load_duplicates(DIR_NAME).values())
+        print(f">>> {n_duplicates} near-duplicate articles are left out, see {DIR_NAME + '/duplicates.json'}")
+    n_docs = build_bow(records, os.path.join(DIR_NAME, 'bow'))
 
     print('\n')
     minutes, seconds = list(map(int, divmod(time.time() - time_started, 60)))
-    print(f">>> Corpus of articles is saved as {DIR_NAME + '/corpus'}")
+    print(f">>> Corpus of {n_docs} articles is saved in {store.dirname} and {DIR_NAME + '/bow'}")
     print(f">>> Total elapsed time : {str(minutes).rjust(3)}m {str(seconds).rjust(2,'0')}s")
\ No newline at end of file
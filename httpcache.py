@@ -0,0 +1,163 @@
+import os, time, zlib, hashlib, sqlite3
+from urllib.parse import urlsplit, parse_qs
+import requests
+import metrics
+from daum import today
+from fetchpolicy import FetchPolicy, FetchError, parse_retry_after
+
+
+"""
+Local cache of HTTP response bodies for Daum listing and article pages
+encoding : UTF-8
+"""
+
+
+class ResponseCache:
+    """
+    Response bodies keyed by SHA-256 of URL, stored zlib-compressed under DIR/objects/<2 chars>/<hash>
+    ETag, Last-Modified, size and last access time are kept in DIR/index.sqlite, which several
+    processes(Ray workers) can share. Least recently used bodies are evicted once the total
+    compressed size exceeds max_bytes.
+    mode 'reuse' serves cached bodies without contacting the server, except listing pages that may still change,
+    mode 'revalidate' sends a conditional GET and serves the cached body on 304 Not Modified
+    """
+    def __init__(self, dirname, max_bytes=2 * 1024**3, mode='reuse'):
+        assert mode in ['reuse', 'revalidate'], 'cache mode must be reuse or revalidate'
+        self.dirname = dirname
+        self.max_bytes = max_bytes
+        self.mode = mode
+        os.makedirs(os.path.join(dirname, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(dirname, 'index.sqlite'), timeout=60, isolation_level=None,
+                                  check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries '
+                        '(key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT, size INTEGER, atime REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)')
+
+    def path(self, key):
+        return os.path.join(self.dirname, 'objects', key[:2], key)
+
+    def lookup(self, url):
+        """
+        Return dict of cached body and validators of url, or None
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        row = self.db.execute('SELECT etag, last_modified FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or not os.path.exists(self.path(key)):
+            return None
+        with open(self.path(key), 'rb') as f:
+            body = zlib.decompress(f.read()).decode('utf-8')
+        self.db.execute('UPDATE entries SET atime = ? WHERE key = ?', (time.time(), key))
+        return dict(body=body, etag=row[0], last_modified=row[1])
+
+    def reusable(self, url):
+        """
+        Whether the cached body of url may be served without a conditional GET
+        """
+        return self.mode == 'reuse' and not live_listing(url)
+
+    def store(self, url, body, etag=None, last_modified=None):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        data = zlib.compress(body.encode('utf-8'))
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        temp = self.path(key) + f".{os.getpid()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, self.path(key))
+        self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                        (key, url, etag, last_modified, len(data), time.time()))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used bodies until the total size is within max_bytes
+        """
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute('SELECT key, size FROM entries ORDER BY atime').fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+            total -= size
+
+
+def live_listing(url):
+    """
+    Whether url is a listing page of today or a later day in Korea, to which articles are still being added
+    The empty page past the last one of such a day becomes a full page later, so neither is reused as cached
+    """
+    parts = urlsplit(url)
+    if '/breakingnews/' not in parts.path:
+        return False
+    return parse_qs(parts.query).get('regDate', [''])[0] >= today()
+
+
+def conditional_headers(entry):
+    """
+    If-None-Match / If-Modified-Since headers revalidating a cached entry
+    """
+    headers = {}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+caches = {}
+
+
+def open_cache(dirname=None, max_bytes=2 * 1024**3, mode='reuse'):
+    """
+    ResponseCache shared by every call in this process, None when dirname is not given
+    """
+    if not dirname:
+        return None
+    if dirname not in caches:
+        caches[dirname] = ResponseCache(dirname, max_bytes, mode)
+    return caches[dirname]
+
+
+def get_text(url, cache=None, policy=None):
+    """
+    requests.get(url).text, served from or saved into cache when it is given
+    Requests time out, and are retried as the FetchPolicy(default one if not given) allows
+    Raise fetchpolicy.FetchError when every attempt failed or the page is answered with another error status
+    """
+    policy = policy or FetchPolicy()
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.reusable(url):
+        metrics.count('cache_hits')
+        return entry['body']
+
+    for attempt in range(policy.retries + 1):
+        started = time.perf_counter()
+        retry_after = None
+        try:
+            response = requests.get(url, headers=conditional_headers(entry), timeout=policy.timeout())
+        except requests.RequestException as error:
+            metrics.error('fetch')
+            reason = type(error).__name__
+        else:
+            metrics.observe('fetch', time.perf_counter() - started, len(response.content))
+            if response.ok or (entry and response.status_code == 304):
+                break
+            metrics.error('fetch')
+            reason = f"HTTP {response.status_code}"
+            if not policy.retryable(response.status_code):
+                raise FetchError(url, reason)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if attempt == policy.retries:
+            raise FetchError(url, f"{reason} after {attempt + 1} attempts")
+        metrics.retry('fetch')
+        time.sleep(policy.delay(attempt, retry_after))
+
+    if entry and response.status_code == 304:
+        metrics.count('cache_hits')
+        return entry['body']
+    if cache:
+        cache.store(url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return response.text
@@ -0,0 +1,308 @@
+import os, sys, json, time, socket, threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+"""
+Crawl instrumentation : latency histograms, bytes, retries and errors per stage(fetch, parse, tokenize, ...)
+Every process records into its own registry and, when CRAWL_METRICS_DIR is set, saves snapshots there so that
+the driver can merge the stages of Ray workers and pipeline processes into a progress line, run_report.json and
+an optional Prometheus text endpoint
+encoding : UTF-8
+"""
+
+
+BOUNDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf')]
+
+
+def empty_stage():
+    return dict(buckets=[0] * len(BOUNDS), count=0, sum=0.0, bytes=0, errors=0, retries=0)
+
+
+def merge(snapshots):
+    """
+    Sum of snapshots {'stages':{stage:...}, 'counters':{name:value}}
+    """
+    merged = dict(stages={}, counters={})
+    for snapshot in snapshots:
+        for stage, values in snapshot['stages'].items():
+            total = merged['stages'].setdefault(stage, empty_stage())
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], values['buckets'])]
+            for key in ['count', 'sum', 'bytes', 'errors', 'retries']:
+                total[key] += values[key]
+        for name, value in snapshot['counters'].items():
+            merged['counters'][name] = merged['counters'].get(name, 0) + value
+    return merged
+
+
+def quantile(stage, q):
+    """
+    Upper bound of the histogram bucket holding quantile q of the latencies of a stage
+    """
+    rank = q * stage['count']
+    seen = 0
+    for bound, count in zip(BOUNDS, stage['buckets']):
+        seen += count
+        if count and seen >= rank:
+            return bound
+    return None
+
+
+def summary(snapshot):
+    """
+    Count, errors, retries, bytes, mean and p50/p90/p99 latency(seconds) of each stage
+    """
+    stages = {}
+    for stage, values in snapshot['stages'].items():
+        stages[stage] = dict(count=values['count'], errors=values['errors'], retries=values['retries'],
+                             bytes=values['bytes'], seconds=values['sum'],
+                             mean=values['sum'] / values['count'] if values['count'] else None,
+                             p50=quantile(values, 0.5), p90=quantile(values, 0.9), p99=quantile(values, 0.99),
+                             histogram={str(bound): count for bound, count in zip(BOUNDS, values['buckets'])})
+    return dict(stages=stages, counters=snapshot['counters'])
+
+
+class Metrics:
+    """
+    Registry of one process. Snapshots are saved to dirname at most every `interval` seconds
+    A process forked from another starts from an empty registry, so that its parent's records are not counted twice
+    Records of each dirname given to use() are kept apart, for worker processes that run tasks of several crawls
+    """
+    def __init__(self, dirname=None, interval=1.0):
+        self.dirname = dirname
+        self.interval = interval
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flushed = 0.0
+        self.dirty = False
+        self.pid = os.getpid()
+        self.others = {}
+
+    def stage(self, name):
+        return self.stages.setdefault(name, empty_stage())
+
+    def check_fork(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.stages = {}
+            self.counters = {}
+            self.others = {}
+            self.flushed = 0.0
+
+    def observe(self, name, seconds, nbytes=0):
+        i = next(i for i, bound in enumerate(BOUNDS) if seconds <= bound)
+        with self.lock:
+            self.check_fork()
+            stage = self.stage(name)
+            stage['buckets'][i] += 1
+            stage['count'] += 1
+            stage['sum'] += seconds
+            stage['bytes'] += nbytes
+            self.dirty = True
+        self.flush()
+
+    def error(self, name):
+        with self.lock:
+            self.check_fork()
+            self.stage(name)['errors'] += 1
+            self.dirty = True
+        self.flush()
+
+    def retry(self, name):
+        with self.lock:
+            self.check_fork()
+            self.stage(name)['retries'] += 1
+            self.dirty = True
+        self.flush()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.check_fork()
+            self.counters[name] = self.counters.get(name, 0) + value
+            self.dirty = True
+        self.flush()
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Observe the time spent in the block, counting an error if it raises
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(name)
+            raise
+        self.observe(name, time.perf_counter() - started)
+
+    def use(self, dirname):
+        """
+        Record into dirname from now on, saving the records so far to the previous dirname first
+        """
+        if dirname == self.dirname:
+            return
+        self.flush(force=True)
+        with self.lock:
+            self.check_fork()
+            self.others[self.dirname] = (self.stages, self.counters)
+            self.stages, self.counters = self.others.pop(dirname, ({}, {}))
+            self.dirname = dirname
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(dict(stages=self.stages, counters=self.counters)))
+
+    def flush(self, force=False):
+        """
+        Save snapshot as dirname/<host>-<pid>.json if anything changed since the last save
+        Threads of a process(e.g. listing pages fetched concurrently) save one at a time
+        """
+        with self.flush_lock:
+            if not self.dirname or not self.dirty or (not force and time.monotonic() - self.flushed < self.interval):
+                return
+            self.flushed = time.monotonic()
+            self.dirty = False
+            path = os.path.join(self.dirname, f"{socket.gethostname()}-{os.getpid()}.json")
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + '.tmp', path)
+
+
+registry = Metrics(os.environ.get('CRAWL_METRICS_DIR'))
+observe = registry.observe
+error = registry.error
+retry = registry.retry
+count = registry.count
+timer = registry.timer
+flush = registry.flush
+use = registry.use
+
+
+def configure(dirname):
+    """
+    Start collecting snapshots of this and child processes(started afterwards) in dirname, clearing older ones
+    Records of an earlier run in the same process are dropped
+    """
+    with registry.lock:
+        registry.stages = {}
+        registry.counters = {}
+        registry.others.pop(dirname, None)
+    os.makedirs(dirname, exist_ok=True)
+    for name in os.listdir(dirname):
+        os.remove(os.path.join(dirname, name))
+    os.environ['CRAWL_METRICS_DIR'] = registry.dirname = dirname
+
+
+def collect():
+    """
+    Merged snapshot of this process and of every process that saved one in CRAWL_METRICS_DIR
+    """
+    snapshots = [registry.snapshot()]
+    if registry.dirname:
+        for name in os.listdir(registry.dirname):
+            if name.endswith('.json') and not name.endswith(f"-{os.getpid()}.json"):
+                try:
+                    with open(os.path.join(registry.dirname, name), 'r') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    return merge(snapshots)
+
+
+class Progress:
+    """
+    Live progress line of documents stored out of total, with throughput, ETA and latency of each stage
+    """
+    def __init__(self, total, label='articles', interval=1.0, stream=sys.stdout):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.stream = stream
+        self.started = time.time()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.base = collect()['counters'].get('documents', 0)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.show()
+        self.stream.write('\n')
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.show()
+
+    def show(self):
+        snapshot = collect()
+        done = snapshot['counters'].get('documents', 0) - self.base
+        elapsed = time.time() - self.started
+        rate = done / elapsed if elapsed else 0.0
+        eta = (self.total - done) / rate if rate else 0.0
+        bar = ('=' * (20 * done // max(self.total, 1))).ljust(20)
+        stages = ' | '.join(f"{stage} p50 {quantile(values, 0.5) * 1000:.0f}ms err {values['errors']}"
+                            for stage, values in sorted(snapshot['stages'].items()) if values['count'])
+        self.stream.write(f"\r>>> progress : [{bar}] {done}/{self.total} {self.label}, {rate:.1f}/s, "
+                          f"ETA {int(eta // 60)}m {int(eta % 60):02d}s | {stages}")
+        self.stream.flush()
+
+
+def write_report(path, **info):
+    """
+    Write run_report.json : info given by the caller(arguments, elapsed time, ...) and summary of every stage
+    """
+    report = dict(info, **summary(collect()))
+    with open(path, 'w') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    return report
+
+
+def prometheus_text(snapshot):
+    lines = []
+    for metric, kind in [('crawl_stage_seconds', 'histogram'), ('crawl_stage_bytes_total', 'counter'),
+                         ('crawl_stage_errors_total', 'counter'), ('crawl_stage_retries_total', 'counter')]:
+        lines.append(f"# TYPE {metric} {kind}")
+        for stage, values in sorted(snapshot['stages'].items()):
+            if kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(BOUNDS, values['buckets']):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {values["sum"]}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {values["count"]}')
+            else:
+                key = metric.split('_')[2]
+                lines.append(f'{metric}{{stage="{stage}"}} {values[key]}')
+    lines.append('# TYPE crawl_counter_total counter')
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f'crawl_counter_total{{name="{name}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text(collect()).encode()
+        self.send_response(200 if self.path == '/metrics' else 404)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_prometheus(port):
+    """
+    Serve merged metrics at http://0.0.0.0:port/metrics in Prometheus text format from a daemon thread
+    """
+    server = ThreadingHTTPServer(('0.0.0.0', port), PrometheusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
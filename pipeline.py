@@ -0,0 +1,120 @@
+import asyncio, threading, queue
+import multiprocessing as mp
+from asyncfetch import AsyncFetcher
+from daum import parse_article, nouns_from_text
+import metrics
+
+
+"""
+Staged producer/consumer pipeline : fetch -> HTML extraction -> tokenization -> shard store
+Stages are joined by bounded queues so that a full downstream queue blocks its producers(backpressure)
+encoding : UTF-8
+"""
+
+
+async def fetch_stage(jobs, html_queue, fetch_workers, fetch_options):
+    """
+    Download articles with at most fetch_workers pages either in flight or waiting for room in html_queue
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(fetch_workers)
+    async with AsyncFetcher(max_inflight=fetch_workers, **fetch_options) as fetcher:
+        async def fetch(idx, url):
+            async with slots:
+                try:
+                    item = (idx, await fetcher.get(url), None)
+                except Exception as error:
+                    item = (idx, None, str(error))
+                await loop.run_in_executor(None, html_queue.put, item)
+        await asyncio.gather(*[fetch(idx, url) for idx, url in jobs])
+
+
+def extract_stage(html_queue, text_queue):
+    """
+    Worker process turning (idx, html, error) into (idx, body text, error) until it receives None
+    """
+    for idx, html, error in iter(html_queue.get, None):
+        if html is None:
+            text_queue.put((idx, None, error))
+            continue
+        try:
+            text_queue.put((idx, parse_article(html), None))
+        except Exception as error:
+            text_queue.put((idx, None, f"{type(error).__name__}: {error}"))
+    metrics.flush(force=True)
+
+
+def tokenize_stage(text_queue, doc_queue):
+    """
+    Worker process turning (idx, body text, error) into (idx, nouns, error) with its own Mecab until it receives None
+    """
+    from konlpy.tag import Mecab
+    mecab = Mecab()
+    for idx, text, error in iter(text_queue.get, None):
+        if text is None:
+            doc_queue.put((idx, None, error))
+            continue
+        with metrics.timer('tokenize'):
+            nouns = nouns_from_text(mecab, text)
+        doc_queue.put((idx, nouns, None))
+    metrics.flush(force=True)
+    doc_queue.put(None)
+
+
+def run_pipeline(jobs, store, fetch_workers=200, extract_workers=2, tokenize_workers=None,
+                 queue_size=1000, fetch_options=None):
+    """
+    Run the pipeline over jobs of (index in urllist, url), appending documents to shardstore.ShardStore as they finish
+    Articles that failed to download or parse are not stored, so that the next run retries them
+    Return {index:reason} of failed articles. Raise RuntimeError if an extractor or tokenizer process dies(e.g. Mecab
+    crashes), as its articles would never arrive; the documents stored so far are kept for the next run
+    """
+    tokenize_workers = tokenize_workers or max(1, mp.cpu_count() - 1)
+    html_queue = mp.Queue(queue_size)
+    text_queue = mp.Queue(queue_size)
+    doc_queue = mp.Queue(queue_size)
+
+    extractors = [mp.Process(target=extract_stage, args=(html_queue, text_queue), daemon=True)
+                  for _ in range(extract_workers)]
+    tokenizers = [mp.Process(target=tokenize_stage, args=(text_queue, doc_queue), daemon=True)
+                  for _ in range(tokenize_workers)]
+    for worker in extractors + tokenizers:
+        worker.start()
+
+    def produce():
+        asyncio.run(fetch_stage(jobs, html_queue, fetch_workers, fetch_options or {}))
+        for _ in extractors:
+            html_queue.put(None)
+        for worker in extractors:
+            worker.join()
+        for _ in tokenizers:
+            text_queue.put(None)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    failed = {}
+    finished = 0
+    while finished < len(tokenizers):
+        try:
+            item = doc_queue.get(timeout=1.0)
+        except queue.Empty:
+            dead = [worker for worker in extractors + tokenizers if worker.exitcode not in (None, 0)]
+            if dead:
+                for worker in extractors + tokenizers:
+                    worker.terminate()
+                raise RuntimeError(f"pipeline worker {dead[0].name} exited with code {dead[0].exitcode}")
+            continue
+        if item is None:
+            finished += 1
+        elif item[1] is None:
+            failed[item[0]] = item[2]
+            metrics.count('failed')
+        else:
+            store.append(*item[:2])
+            metrics.count('documents')
+
+    producer.join()
+    for worker in tokenizers:
+        worker.join()
+    return failed
@@ -0,0 +1,112 @@
+import os, json, glob, shutil
+
+
+"""
+Append-only, resumable store of extracted nouns
+encoding : UTF-8
+"""
+
+
+class ShardStore:
+    """
+    Documents of DIR_NAME/shards/shard-NNNNN.jsonl, one {"idx":index in urllist.txt, "nouns":[...]} per line
+    Every run writes to new shard files, so a crash leaves at most one truncated line at the end of a shard,
+    which is ignored on reading. Indexes present in the shards are the articles that are done.
+    """
+    def __init__(self, dirname, shard_size=5000):
+        self.dirname = os.path.join(dirname, 'shards')
+        self.shard_size = shard_size
+        self.file = None
+        self.n_written = 0
+        os.makedirs(self.dirname, exist_ok=True)
+
+    def shards(self):
+        return sorted(glob.glob(os.path.join(self.dirname, 'shard-*.jsonl')))
+
+    def exists(self):
+        return len(self.shards()) > 0
+
+    def records(self):
+        """
+        Iterate over (idx, nouns) in order of writing, skipping truncated lines and duplicated indexes
+        """
+        seen = set()
+        for shard in self.shards():
+            with open(shard, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        doc = json.loads(line)
+                    except ValueError:
+                        continue
+                    if doc['idx'] not in seen:
+                        seen.add(doc['idx'])
+                        yield doc['idx'], doc['nouns']
+
+    def __iter__(self):
+        for _, nouns in self.records():
+            yield nouns
+
+    def __len__(self):
+        return len(self.done())
+
+    def ids(self):
+        """
+        Indexes in urllist.txt of documents in order of iteration
+        """
+        return [idx for idx, _ in self.records()]
+
+    def done(self):
+        return set(self.ids())
+
+    def remaining(self, n_urls):
+        """
+        Indexes out of range(n_urls) that are not stored yet
+        """
+        done = self.done()
+        return [idx for idx in range(n_urls) if idx not in done]
+
+    def append(self, idx, nouns):
+        if self.file is None or self.n_written >= self.shard_size:
+            self.rotate()
+        self.file.write(json.dumps({'idx':idx, 'nouns':nouns}, ensure_ascii=False) + '\n')
+        self.file.flush()
+        self.n_written += 1
+
+    def rotate(self):
+        self.close()
+        shards = self.shards()
+        number = int(os.path.basename(shards[-1])[6:11]) + 1 if shards else 0
+        self.file = open(os.path.join(self.dirname, f"shard-{str(number).rjust(5, '0')}.jsonl"), 'w', encoding='utf-8')
+        self.n_written = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remap(self, old_urls, new_urls):
+        """
+        Keep documents of articles that are still in new_urls under their new index, dropping the others,
+        e.g. when urllist.txt is scraped again and a failed listing day adds articles in the middle
+        The documents are rewritten into new shards that replace the old ones only once they are complete
+        """
+        self.close()
+        position = {url: idx for idx, url in enumerate(new_urls)}
+        parent = os.path.join(os.path.dirname(self.dirname), 'remap')
+        shutil.rmtree(parent, ignore_errors=True)
+        remapped = ShardStore(parent, self.shard_size)
+        for idx, nouns in self.records():
+            if idx < len(old_urls) and old_urls[idx] in position:
+                remapped.append(position[old_urls[idx]], nouns)
+        remapped.close()
+        shutil.rmtree(self.dirname)
+        os.replace(remapped.dirname, self.dirname)
+        os.rmdir(parent)
+
+    def reset(self):
+        """
+        Remove every stored document, e.g. when urllist.txt is scraped again and indexes are no longer valid
+        """
+        self.close()
+        shutil.rmtree(self.dirname)
+        os.mkdir(self.dirname)
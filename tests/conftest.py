@@ -0,0 +1,4 @@
+import os, sys
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+import asyncio, time, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import asyncfetch
+from asyncfetch import AsyncFetcher, TokenBucket
+from fetchpolicy import FetchPolicy
+
+
+LISTING = ('<html><body><div class="box_etc"><div class="cont_thumb"><a href="https://v.daum.net/v/{date}{page}">'
+           '제목</a><span class="info_news">한겨레 10:00</span></div></div></body></html>')
+LAST = '<html><body><div class="box_etc"><p class="txt_none">기사가 없습니다</p></div></body></html>'
+
+
+@pytest.fixture
+def server():
+    """
+    Base URL of a server and the peak number of requests it served at once
+    Listing pages of 20200801 have 3 pages, /bad answers invalid UTF-8, /unknown an unknown charset,
+    /missing 404, and any other path answers '기사' after 50ms
+    """
+    state = dict(active=0, peak=0)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            try:
+                self.answer()
+            finally:
+                with lock:
+                    state['active'] -= 1
+
+        def answer(self):
+            if self.path.startswith('/breakingnews/'):
+                page = int(self.path.split('page=')[1].split('&')[0])
+                body = LISTING.format(date=self.path[-8:], page=page) if page <= 3 else LAST
+            elif self.path == '/bad':
+                body = None
+            else:
+                time.sleep(0.05)
+                body = '기사'
+            self.send_response(404 if self.path == '/missing' else 200)
+            charset = 'x-unknown' if self.path == '/unknown' else 'utf-8'
+            self.send_header('Content-Type', f"text/html; charset={charset}")
+            self.end_headers()
+            self.wfile.write(b'bad \xff' if body is None else body.encode('utf-8'))
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", state
+    httpd.shutdown()
+
+
+def test_token_bucket():
+    async def acquire(n):
+        bucket = TokenBucket(rate=50.0, capacity=1)
+        started = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - started
+    assert 0.18 < asyncio.run(acquire(11)) < 1.0
+
+
+def test_max_inflight(server):
+    base_url, state = server
+    pages = {}
+    urllist = [f"https://v.daum.net/v/{i}" for i in range(12)]
+    asyncio.run(asyncfetch.fetch_pages(urllist, lambda idx, html, error=None: pages.update({idx: html}),
+                                       max_inflight=3, host_rate=None, base_url=base_url))
+    assert pages == {idx: '기사' for idx in range(12)}
+    assert state['peak'] <= 3
+
+
+def test_get_url_titles(server):
+    base_url, _ = server
+    for probes in [None, 4]:
+        days = asyncio.run(asyncfetch.get_url_titles('politics', ['20200801'], probes, base_url=base_url))
+        assert days == [dict(urls=[f"https://v.daum.net/v/20200801{page}" for page in [1, 2, 3]], titles=['제목'] * 3)]
+
+
+def test_fetch_pages_keeps_going(server):
+    base_url, _ = server
+    pages = {}
+    def callback(idx, html, error=None):
+        pages[idx] = html if html is not None else error
+    urllist = [base_url + path for path in ['/bad', '/unknown', '/ok', '/missing']]
+    asyncio.run(asyncfetch.fetch_pages(urllist, callback, policy=FetchPolicy(retries=0)))
+    assert pages[0] == 'bad �'
+    assert pages[1] == pages[2] == '기사'
+    assert pages[3].startswith('HTTP 404')
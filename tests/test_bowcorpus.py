@@ -0,0 +1,37 @@
+from collections import Counter
+from bowcorpus import build_bow, load_vocab, MmapCorpus
+
+
+DOCS = [(3, ['국회', '정부', '국회']), (5, []), (8, ['정부', '예산', '예산', '예산']), (9, ['국회'])]
+
+
+def test_round_trip(tmp_path):
+    dirname = str(tmp_path / 'bow')
+    assert build_bow(iter(DOCS), dirname) == 4
+    assert load_vocab(dirname) == ['국회', '정부', '예산']
+    bow = MmapCorpus(dirname)
+    assert len(bow) == 4
+    assert bow.docids.tolist() == [3, 5, 8, 9]
+    for (_, nouns), doc in zip(DOCS, bow):
+        assert Counter({bow.id2word[wordid]: count for wordid, count in doc}) == Counter(nouns)
+    assert list(bow) == [[(0, 2), (1, 1)], [], [(1, 1), (2, 3)], [(0, 1)]]
+
+
+def test_subset(tmp_path):
+    build_bow(iter(DOCS), str(tmp_path / 'bow'))
+    bow = MmapCorpus(str(tmp_path / 'bow'))
+    tail = bow.slice(2)
+    assert tail.docids.tolist() == [8, 9]
+    assert list(tail) == [[(1, 1), (2, 3)], [(0, 1)]]
+    picked = tail.subset([True, False])
+    assert picked.docids.tolist() == [8]
+    assert list(picked) == [[(1, 1), (2, 3)]]
+    assert len(bow) == 4 and len(bow.slice(1, 3)) == 2
+
+
+def test_rebuild(tmp_path):
+    dirname = str(tmp_path / 'bow')
+    build_bow(iter(DOCS), dirname)
+    build_bow(iter(DOCS[:1]), dirname)
+    assert MmapCorpus(dirname).docids.tolist() == [3]
+    assert not (tmp_path / 'bow.tmp').exists()
@@ -0,0 +1,34 @@
+import pytest
+from daum import search_pages, scrape_day
+
+
+def count_pages(n_pages, probes):
+    """
+    Number of pages found by search_pages for a day of n_pages, and the set of pages it probed
+    """
+    search = search_pages(probes)
+    probed = set()
+    pagenums = next(search)
+    while True:
+        probed.update(pagenums)
+        try:
+            pagenums = search.send([pagenum > n_pages for pagenum in pagenums])
+        except StopIteration as stop:
+            return stop.value, probed
+
+
+@pytest.mark.parametrize('probes', [1, 2, 8])
+@pytest.mark.parametrize('n_pages', [0, 1, 2, 3, 7, 8, 9, 100, 1000])
+def test_search_pages(n_pages, probes):
+    found, probed = count_pages(n_pages, probes)
+    assert found == n_pages
+    assert n_pages + 1 in probed
+
+
+@pytest.mark.parametrize('probes', [None, 4])
+def test_scrape_day(probes):
+    def fetch(pagenum):
+        if pagenum > 5:
+            return dict(urls=[], titles=[], last=True)
+        return dict(urls=[f"u{pagenum}"], titles=[f"t{pagenum}"], last=False)
+    assert scrape_day(fetch, probes) == dict(urls=[f"u{i}" for i in range(1, 6)], titles=[f"t{i}" for i in range(1, 6)])
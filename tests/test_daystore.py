@@ -0,0 +1,47 @@
+import datetime
+import daum
+from daystore import DayStore, DayRouter, assemble
+
+
+def listing(*ids):
+    return dict(urls=[f"https://v.daum.net/v/{i}" for i in ids], titles=[f"title {i}" for i in ids])
+
+
+def test_merge_listing(tmp_path):
+    day = DayStore(str(tmp_path), 'politics', '20200801')
+    day.merge_listing(listing(1, 2))
+    day.store.append(0, ['국회'])
+    day.store.close()
+    day.merge_listing(listing(3, 1, 2))
+    assert day.urls() == [f"https://v.daum.net/v/{i}" for i in [1, 2, 3]]
+    assert day.remaining() == [1, 2]
+    assert day.listed()
+
+
+def test_today_is_not_listed(tmp_path):
+    yesterday = (datetime.datetime.now(daum.KST) - datetime.timedelta(days=1)).strftime('%Y%m%d')
+    today = DayStore(str(tmp_path), 'politics', daum.today())
+    today.merge_listing(listing(1))
+    past = DayStore(str(tmp_path), 'politics', yesterday)
+    past.merge_listing(listing(2))
+    assert not today.listed()
+    assert past.listed()
+
+
+def test_router_and_assemble(tmp_path):
+    days = [DayStore(str(tmp_path), 'politics', date) for date in ['20200801', '20200802']]
+    days[0].merge_listing(listing(1, 2))
+    days[1].merge_listing(listing(3))
+    days[0].store.append(1, ['정부'])
+    days[0].store.close()
+
+    router = DayRouter(days)
+    assert router.urllist == [f"https://v.daum.net/v/{i}" for i in [1, 3]]
+    router.append(0, ['국회'])
+    router.append(1, ['선거'])
+    router.close()
+
+    store = assemble(days, str(tmp_path / 'politics-20200801-20200802'))
+    assert sorted(store.records()) == [(0, ['국회']), (1, ['정부']), (2, ['선거'])]
+    assert (tmp_path / 'politics-20200801-20200802' / 'urllist.txt').read_text().split() == \
+        [f"https://v.daum.net/v/{i}" for i in [1, 2, 3]]
@@ -0,0 +1,32 @@
+import numpy as np
+from dedup import shingles, MinHasher, find_duplicates, dedupe, load_duplicates
+
+
+STORY = [f"명사{i}" for i in range(40)]
+OTHER = [f"단어{i}" for i in range(40)]
+
+
+def test_shingles():
+    assert len(shingles(['국회', '정부', '국회', '정부', '국회'])) == 2
+    assert len(shingles(['국회'])) == 1
+    assert len(shingles([])) == 0
+
+
+def test_signature_estimates_jaccard():
+    hasher = MinHasher(num_perm=512)
+    a, b = shingles(STORY), shingles(STORY[:30] + OTHER[:10])
+    jaccard = len(set(a.tolist()) & set(b.tolist())) / len(set(a.tolist()) | set(b.tolist()))
+    assert abs(np.mean(hasher.signature(a) == hasher.signature(b)) - jaccard) < 0.1
+
+
+def test_find_duplicates():
+    records = [(0, STORY), (1, OTHER), (2, STORY[:39] + ['연합뉴스']), (3, []), (4, STORY), (5, STORY[:20] + OTHER[:20])]
+    assert find_duplicates(records) == {0: [2, 4]}
+    assert find_duplicates([]) == {}
+
+
+def test_dedupe(tmp_path):
+    assert load_duplicates(str(tmp_path)) == {}
+    kept = dedupe(iter([(3, STORY), (5, OTHER), (8, STORY)]), str(tmp_path))
+    assert [idx for idx, _ in kept] == [3, 5]
+    assert load_duplicates(str(tmp_path)) == {3: [8]}
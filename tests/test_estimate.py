@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+from bowcorpus import build_bow, MmapCorpus
+import estimate
+
+
+def corpus(tmp_path, n_docs):
+    build_bow(((idx, [f"word{idx % 3}", 'common']) for idx in range(n_docs)), str(tmp_path / 'bow'))
+    return MmapCorpus(str(tmp_path / 'bow'))
+
+
+def test_unseen(tmp_path):
+    bow = corpus(tmp_path, 25)
+    assert np.flatnonzero(estimate.unseen(bow, 20)).tolist() == list(range(20, 25))
+    assert np.flatnonzero(estimate.unseen(bow, 20, heldout=10)).tolist() == [0, 10] + list(range(20, 25))
+    assert len(bow.subset(estimate.unseen(bow, 25))) == 0
+
+
+def month(tmp_path, monkeypatch, docs):
+    """
+    Run estimate from tmp_path on a dirs/politics-20200801-20200831 corpus of docs, with models saved under tmp_path
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(estimate, 'datapath', lambda name: str(tmp_path / name))
+    dirname = tmp_path / 'dirs' / 'politics-20200801-20200831'
+    dirname.mkdir(parents=True, exist_ok=True)
+    (dirname / 'urllist.txt').write_text('\n'.join(f"https://v.daum.net/v/{i}" for i in range(len(docs))))
+    (dirname / 'titlelist.txt').write_text('\n'.join(f"title {i}" for i in range(len(docs))))
+    build_bow(enumerate(docs), str(dirname / 'bow'))
+    return ['-c', 'politics', '-s', '20200801', '-e', '20200831', '-k', '2', '-na', '2', '-nv', '2', '-w', '1']
+
+
+def test_update(tmp_path, monkeypatch):
+    docs = [['국회', '정부'], ['예산', '정부'], ['국회', '예산']] * 4
+    argv = month(tmp_path, monkeypatch, docs)
+    estimate.main(['y'] + argv)
+    month(tmp_path, monkeypatch, docs + [['국회', '선거']] * 3)
+    estimate.main(['n', '--update'] + argv)
+    info = estimate.load_info(str(tmp_path / 'dirs' / 'politics-20200801-20200831'))
+    assert [entry['mode'] for entry in info['history']] == ['fit', 'update']
+    assert (info['n_docs'], info['n_terms']) == (15, 4)
+
+
+def test_update_refuses_changed_corpus(tmp_path, monkeypatch):
+    docs = [['국회', '정부'], ['예산', '정부'], ['국회', '예산']] * 4
+    argv = month(tmp_path, monkeypatch, docs)
+    estimate.main(['y'] + argv)
+    month(tmp_path, monkeypatch, docs[1:] + [['국회', '선거']])
+    with pytest.raises(AssertionError, match='have changed'):
+        estimate.main(['n', '--update'] + argv)
+    assert estimate.load_info(str(tmp_path / 'dirs' / 'politics-20200801-20200831'))['version'] == 1
+
+
+@pytest.mark.parametrize('n_docs, topn', [(50, 5), (7, 20), (1, 3)])
+def test_docs_by_topic(n_docs, topn):
+    theta = np.random.default_rng(n_docs).dirichlet(np.ones(4), size=n_docs).astype(np.float32)
+    reference = np.argsort(-theta, axis=0)[:topn]
+    top = estimate.docs_by_topic(theta, topn)
+    assert top['topic'].tolist() == np.repeat(np.arange(4), len(reference)).tolist()
+    assert top['docidx'].tolist() == reference.T.ravel().tolist()
+    assert top['proportion'].tolist() == np.take_along_axis(theta, reference, axis=0).T.ravel().tolist()
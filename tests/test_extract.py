@@ -0,0 +1,39 @@
+import pytest
+import daum
+from daum import PageError
+
+
+LISTING = """<html><body><div class="box_etc"><ul>
+<li><div class="cont_thumb"><a href="https://v.daum.net/v/1">첫 번째 기사</a><span class="info_news">한겨레 10:00</span></div></li>
+<li><div class="cont_thumb"><a href="https://v.daum.net/v/2">통신사 기사</a><span class="info_news">연합뉴스 10:01</span></div></li>
+</ul></div></body></html>"""
+LAST = '<html><body><div class="box_etc"><p class="txt_none">기사가 없습니다</p></div></body></html>'
+ARTICLE = """<html><body><div class="news_view">
+<p dmcf-ptype="general">국회가 오늘 본회의를 열었습니다.</p>
+<p dmcf-ptype="general">짧은 문단</p>
+<p dmcf-ptype="general">기자 reporter@example.com 에게 문의하세요.</p>
+</div></body></html>"""
+EMPTY_PAGES = ['', '   \n', '<html></html>', '<html><body><div class="other"></div></body></html>']
+
+
+@pytest.mark.parametrize('name', list(daum.EXTRACTORS))
+def test_parse_listing(name):
+    parse_listing, _ = daum.EXTRACTORS[name]
+    assert parse_listing(LISTING) == dict(urls=['https://v.daum.net/v/1'], titles=['첫 번째 기사'], last=False)
+    assert parse_listing(LAST) == dict(urls=[], titles=[], last=True)
+
+
+@pytest.mark.parametrize('name', list(daum.EXTRACTORS))
+def test_parse_paragraphs(name):
+    _, parse_paragraphs = daum.EXTRACTORS[name]
+    assert parse_paragraphs(ARTICLE) == ['국회가 오늘 본회의를 열었습니다.']
+
+
+@pytest.mark.parametrize('html', EMPTY_PAGES)
+@pytest.mark.parametrize('name', list(daum.EXTRACTORS))
+def test_empty_pages_raise_page_error(name, html):
+    parse_listing, parse_paragraphs = daum.EXTRACTORS[name]
+    with pytest.raises(PageError, match='div.box_etc'):
+        parse_listing(html)
+    with pytest.raises(PageError, match='div.news_view'):
+        parse_paragraphs(html)
@@ -0,0 +1,80 @@
+import time, threading, email.utils
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import httpcache
+from fetchpolicy import FetchPolicy, FetchError, Quarantine, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after('-5') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after('soon') is None
+    assert 50 < parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+def test_delay():
+    policy = FetchPolicy(backoff=0.5, max_backoff=3.0, max_retry_after=10.0)
+    for attempt in range(8):
+        assert 0 <= policy.delay(attempt) <= min(3.0, 0.5 * 2 ** attempt)
+    assert policy.delay(0, retry_after=4.0) == 4.0
+    assert policy.delay(0, retry_after=600.0) == 10.0
+
+
+def test_retryable():
+    policy = FetchPolicy()
+    assert all(policy.retryable(status) for status in [429, 500, 502, 503, 504])
+    assert not any(policy.retryable(status) for status in [200, 304, 400, 403, 404])
+    assert FetchPolicy(connect_timeout=2, read_timeout=7).timeout() == (2, 7)
+
+
+@pytest.fixture
+def server():
+    """
+    Base URL of a server answering /flaky with 429, 503 and then 200, and /missing with 404
+    """
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            status = 404 if self.path == '/missing' else [429, 503, 200][min(hits[self.path], 3) - 1]
+            self.send_response(status)
+            if status == 429:
+                self.send_header('Retry-After', '0')
+            self.end_headers()
+            self.wfile.write(b'ok' if status == 200 else b'')
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", hits
+    httpd.shutdown()
+
+
+def test_get_text_retries(server):
+    base_url, hits = server
+    assert httpcache.get_text(base_url + '/flaky', policy=FetchPolicy(retries=2, backoff=0.01)) == 'ok'
+    assert hits['/flaky'] == 3
+
+
+def test_get_text_gives_up(server):
+    base_url, hits = server
+    with pytest.raises(FetchError, match='HTTP 503 after 2 attempts'):
+        httpcache.get_text(base_url + '/flaky', policy=FetchPolicy(retries=1, backoff=0.01))
+    with pytest.raises(FetchError, match='HTTP 404'):
+        httpcache.get_text(base_url + '/missing', policy=FetchPolicy(retries=3, backoff=0.01))
+    assert hits['/missing'] == 1
+
+
+def test_quarantine(tmp_path):
+    quarantine = Quarantine(str(tmp_path / 'failed_urls.txt'))
+    quarantine.add('https://v.daum.net/v/1', 'HTTP 404\n: https://v.daum.net/v/1')
+    quarantine.save()
+    assert Quarantine(quarantine.path).load() == {'https://v.daum.net/v/1': 'HTTP 404 : https://v.daum.net/v/1'}
+    Quarantine(quarantine.path).save()
+    assert not (tmp_path / 'failed_urls.txt').exists()
@@ -0,0 +1,95 @@
+import json, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import requests
+import crawlworker
+from frontier import Frontier
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = Frontier(str(tmp_path / 'frontier.sqlite'), lease_seconds=60.0, max_attempts=2)
+    frontier.seed(['politics'], ['20200801', '20200802'])
+    return frontier
+
+
+def listing(n):
+    return dict(urls=[f"https://v.daum.net/v/{i}?f=o" for i in range(n)], titles=[f"title {i}" for i in range(n)])
+
+
+def test_lease_listings_first(frontier):
+    frontier.complete('a', frontier.lease('a', 1)['tasks'][0]['key'], listing(3))
+    tasks = frontier.lease('a', 10)['tasks']
+    assert [task['kind'] for task in tasks] == ['listing'] + ['article'] * 3
+    assert tasks[1]['key'] == 'https://v.daum.net/v/0'
+
+
+def test_finished(frontier):
+    for task in frontier.lease('a', 10)['tasks']:
+        frontier.complete('a', task['key'], listing(0))
+    assert frontier.lease('a', 10) == dict(tasks=[], finished=True)
+
+
+def test_expire(tmp_path):
+    frontier = Frontier(str(tmp_path / 'frontier.sqlite'), lease_seconds=60.0, max_attempts=2)
+    frontier.seed(['politics'], ['20200801'])
+    key = frontier.lease('a', 10)['tasks'][0]['key']
+    assert frontier.lease('b', 10) == dict(tasks=[], finished=False)
+    frontier.db.execute('UPDATE tasks SET expires = 0')
+    assert [task['key'] for task in frontier.lease('b', 10)['tasks']] == [key]
+    frontier.db.execute('UPDATE tasks SET expires = 0')
+    assert frontier.lease('c', 10) == dict(tasks=[], finished=True)
+    assert frontier.stats()['tasks'] == {'listing': {'failed': 1}}
+
+
+def test_steal(frontier):
+    frontier.seed(['society'], ['20200801', '20200802'])
+    leased = [task['key'] for task in frontier.lease('a', 10)['tasks']]
+    assert len(leased) == 4
+    assert [task['key'] for task in frontier.lease('b', 10)['tasks']] == leased[2:]
+    assert frontier.complete('a', leased[0], listing(0))['leased'] == leased[1:2]
+    assert frontier.stats()['workers'] == 2
+
+
+def test_fail(frontier):
+    key = frontier.lease('a', 1)['tasks'][0]['key']
+    frontier.fail('a', key, 'PageError: listing page without div.box_etc')
+    assert frontier.lease('b', 1)['tasks'][0]['key'] == key
+    frontier.fail('b', key, 'PageError: listing page without div.box_etc')
+    assert frontier.stats()['tasks']['listing'] == {'failed': 1, 'pending': 1}
+
+
+def test_resume(frontier, tmp_path):
+    frontier.complete('a', frontier.lease('a', 1)['tasks'][0]['key'], listing(2))
+    restarted = Frontier(str(tmp_path / 'frontier.sqlite'))
+    assert restarted.stats()['tasks'] == {'listing': {'done': 1, 'pending': 1}, 'article': {'pending': 2}}
+
+
+def test_client_retries(monkeypatch):
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            calls.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            status, body = (503, b'') if len(calls) < 3 else (200, b'{"tasks": []}')
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(crawlworker.time, 'sleep', lambda seconds: None)
+    try:
+        client = crawlworker.FrontierClient(f"http://127.0.0.1:{httpd.server_port}/", 'w1', retries=3)
+        assert client.call('lease', n=4) == dict(tasks=[])
+        assert calls == [dict(n=4, worker='w1')] * 3
+        calls.clear()
+        client.retries = 2
+        with pytest.raises(requests.HTTPError):
+            client.call('lease', n=4)
+    finally:
+        httpd.shutdown()
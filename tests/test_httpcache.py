@@ -0,0 +1,68 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import daum, httpcache
+from httpcache import ResponseCache
+
+
+@pytest.fixture
+def server():
+    """
+    Base URL of a server answering with ETag "v1" and 304 to a matching If-None-Match, and the requests it received
+    """
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, self.headers.get('If-None-Match')))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            self.wfile.write(f"page {self.path}".encode('utf-8'))
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", requests
+    httpd.shutdown()
+
+
+def test_reuse(server, tmp_path):
+    base_url, requests = server
+    cache = ResponseCache(str(tmp_path), mode='reuse')
+    assert httpcache.get_text(base_url + '/v/1', cache) == 'page /v/1'
+    assert httpcache.get_text(base_url + '/v/1', cache) == 'page /v/1'
+    assert requests == [('/v/1', None)]
+
+
+def test_revalidate(server, tmp_path):
+    base_url, requests = server
+    cache = ResponseCache(str(tmp_path), mode='revalidate')
+    assert httpcache.get_text(base_url + '/v/1', cache) == 'page /v/1'
+    assert httpcache.get_text(base_url + '/v/1', cache) == 'page /v/1'
+    assert requests == [('/v/1', None), ('/v/1', '"v1"')]
+
+
+def test_live_listing_is_revalidated(server, tmp_path):
+    base_url, requests = server
+    cache = ResponseCache(str(tmp_path), mode='reuse')
+    past = f"{base_url}/breakingnews/politics?page=1&regDate=20200801"
+    live = f"{base_url}/breakingnews/politics?page=1&regDate={daum.today()}"
+    for url in [past, live, past, live]:
+        httpcache.get_text(url, cache)
+    assert [etag for path, etag in requests] == [None, None, '"v1"']
+    assert not httpcache.live_listing('https://v.daum.net/v/20991231000001')
+
+
+def test_evict(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=2500)
+    for i in range(5):
+        cache.store(f"https://v.daum.net/v/{i}", ''.join(chr(0xac00 + (i * 7919 + j * 31) % 11172) for j in range(300)))
+    assert cache.lookup('https://v.daum.net/v/0') is None
+    assert cache.lookup('https://v.daum.net/v/4')['body'].startswith(chr(0xac00 + (4 * 7919) % 11172))
@@ -0,0 +1,57 @@
+import os, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import pipeline
+from fetchpolicy import FetchPolicy
+from shardstore import ShardStore
+
+
+ARTICLE = '<html><body><div class="news_view"><p dmcf-ptype="general">국회 본회의 예산안 통과</p></div></body></html>'
+
+
+def split_stage(text_queue, doc_queue):
+    """
+    tokenize_stage without Mecab : words of the text
+    """
+    for idx, text, error in iter(text_queue.get, None):
+        doc_queue.put((idx, None, error) if text is None else (idx, text.split(), None))
+    doc_queue.put(None)
+
+
+def crash_stage(text_queue, doc_queue):
+    os._exit(3)
+
+
+@pytest.fixture
+def server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(404 if self.path == '/missing' else 200)
+            self.end_headers()
+            self.wfile.write(ARTICLE.encode('utf-8') if self.path.startswith('/v/') else b'<html></html>')
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def test_run_pipeline(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'tokenize_stage', split_stage)
+    store = ShardStore(str(tmp_path))
+    jobs = [(0, server + '/v/1'), (1, server + '/missing'), (2, server + '/empty'), (3, server + '/v/2')]
+    failed = pipeline.run_pipeline(jobs, store, fetch_workers=2, extract_workers=2, tokenize_workers=2,
+                                   fetch_options=dict(policy=FetchPolicy(retries=0)))
+    store.close()
+    assert sorted(store.records()) == [(0, ['국회', '본회의', '예산안', '통과']), (3, ['국회', '본회의', '예산안', '통과'])]
+    assert sorted(failed) == [1, 2]
+    assert failed[2].startswith('PageError')
+
+
+def test_dead_tokenizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'tokenize_stage', crash_stage)
+    with pytest.raises(RuntimeError, match='exited with code 3'):
+        pipeline.run_pipeline([], ShardStore(str(tmp_path)), extract_workers=1, tokenize_workers=2)
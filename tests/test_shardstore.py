@@ -0,0 +1,52 @@
+import os
+from shardstore import ShardStore
+
+
+def test_resume(tmp_path):
+    store = ShardStore(str(tmp_path), shard_size=2)
+    for idx in [0, 1, 2]:
+        store.append(idx, [f"noun{idx}"])
+    store.close()
+
+    store = ShardStore(str(tmp_path), shard_size=2)
+    assert store.remaining(5) == [3, 4]
+    store.append(3, ['noun3'])
+    store.close()
+    assert len(store.shards()) == 3
+    assert list(store.records()) == [(0, ['noun0']), (1, ['noun1']), (2, ['noun2']), (3, ['noun3'])]
+
+
+def test_truncated_shard(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.append(0, ['국회'])
+    store.append(1, ['정부'])
+    store.close()
+    with open(store.shards()[-1], 'a', encoding='utf-8') as f:
+        f.write('{"idx": 2, "nouns": ["선')
+
+    store = ShardStore(str(tmp_path))
+    assert store.remaining(3) == [2]
+    store.append(2, ['선거'])
+    store.append(1, ['정부'])
+    store.close()
+    assert store.ids() == [0, 1, 2]
+    assert list(store) == [['국회'], ['정부'], ['선거']]
+
+
+def test_reset(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.append(0, ['국회'])
+    store.reset()
+    assert not store.exists()
+    assert os.path.isdir(store.dirname)
+
+
+def test_remap(tmp_path):
+    store = ShardStore(str(tmp_path), shard_size=2)
+    old_urls = ['a', 'b', 'c', 'd']
+    for idx, url in enumerate(old_urls):
+        store.append(idx, [url])
+    store.remap(old_urls, ['a', 'x', 'y', 'b', 'd'])
+    assert list(store.records()) == [(0, ['a']), (3, ['b']), (4, ['d'])]
+    assert store.remaining(5) == [1, 2]
+    assert not os.path.exists(tmp_path / 'remap')
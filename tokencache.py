@@ -0,0 +1,110 @@
+import json, time, hashlib, sqlite3
+from collections import OrderedDict
+from daum import pattern, nouns_from_text
+
+
+"""
+Memoization of Mecab output per paragraph, so that boilerplate and articles republished by several
+publishers are tokenized once
+encoding : UTF-8
+"""
+
+
+def normalize(text):
+    """
+    Paragraph as it is tokenized : bracketed bylines removed and whitespace collapsed
+    """
+    return ' '.join(pattern.sub('', text).split())
+
+
+class TokenCache:
+    """
+    Nouns of paragraphs keyed by SHA-1 of the normalized paragraph
+    Each process keeps up to local_entries in memory in front of a SQLite table at path, which every
+    worker of a run shares. Along with the nouns, the time Mecab took is stored so that hits can be
+    counted as CPU time saved. Least recently used rows are evicted beyond max_entries.
+    """
+    def __init__(self, path, max_entries=200000, local_entries=20000):
+        self.max_entries = max_entries
+        self.local_entries = local_entries
+        self.local = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, nouns TEXT, seconds REAL, atime REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS memo_atime ON memo (atime)')
+
+    def remember(self, key, entry):
+        self.local[key] = entry
+        self.local.move_to_end(key)
+        while len(self.local) > self.local_entries:
+            self.local.popitem(last=False)
+
+    def lookup(self, keys):
+        """
+        {key:(nouns, seconds)} of keys that are cached in this process or in the shared table
+        """
+        found = {}
+        for key in keys:
+            if key in self.local:
+                self.local.move_to_end(key)
+                found[key] = self.local[key]
+
+        missing = [key for key in keys if key not in found]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = self.db.execute(f"SELECT key, nouns, seconds FROM memo WHERE key IN ({','.join('?' * len(chunk))})",
+                                   chunk).fetchall()
+            for key, nouns, seconds in rows:
+                found[key] = (json.loads(nouns), seconds)
+                self.remember(key, found[key])
+            if rows:
+                now = time.time()
+                self.db.executemany('UPDATE memo SET atime = ? WHERE key = ?', [(now, row[0]) for row in rows])
+        return found
+
+    def store(self, entries):
+        """
+        Save {key:(nouns, seconds)} and evict least recently used rows beyond max_entries
+        """
+        now = time.time()
+        self.db.execute('BEGIN')
+        self.db.executemany('INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)',
+                            [(key, json.dumps(nouns, ensure_ascii=False), seconds, now)
+                             for key, (nouns, seconds) in entries.items()])
+        self.db.execute('COMMIT')
+        for key, entry in entries.items():
+            self.remember(key, entry)
+
+        excess = self.db.execute('SELECT COUNT(*) FROM memo').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.db.execute('DELETE FROM memo WHERE key IN (SELECT key FROM memo ORDER BY atime LIMIT ?)', (excess,))
+
+    def tokenize(self, mecab, paragraphs):
+        """
+        Nouns of each paragraph, running Mecab only on paragraphs that are not cached
+        """
+        texts = [normalize(paragraph) for paragraph in paragraphs]
+        keys = [hashlib.sha1(text.encode('utf-8')).hexdigest() for text in texts]
+        found = self.lookup(list(dict.fromkeys(keys)))
+
+        computed = {}
+        for key, text in zip(keys, texts):
+            if key in found:
+                self.hits += 1
+                self.saved += found[key][1]
+            elif key in computed:
+                self.hits += 1
+                self.saved += computed[key][1]
+            else:
+                self.misses += 1
+                started = time.perf_counter()
+                computed[key] = (nouns_from_text(mecab, text), time.perf_counter() - started)
+        if computed:
+            self.store(computed)
+        return [(found.get(key) or computed[key])[0] for key in keys]
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, saved_seconds=self.saved)
@@ -0,0 +1,192 @@
+import os, time, ray
+from daum import parse_article, parse_paragraphs, nouns_from_text
+from tokencache import TokenCache
+import metrics
+
+
+"""
+Tokenization service : Ray actors that each keep one konlpy.Mecab for their lifetime and turn batches of
+downloaded articles into nouns
+encoding : UTF-8
+"""
+
+
+def fetched(refs):
+    """
+    Pages of object refs of fetch tasks, None for tasks that failed
+    """
+    refs = list(refs)
+    try:
+        return ray.get(refs)
+    except Exception:
+        pages = []
+        for ref in refs:
+            try:
+                pages.append(ray.get(ref))
+            except Exception:
+                pages.append(None)
+        return pages
+
+
+def extract(html, paragraphs):
+    """
+    Paragraphs of an article page, or its body text as one paragraph, None if the page is missing or malformed
+    """
+    if html is None:
+        return None
+    try:
+        return parse_paragraphs(html) if paragraphs else [parse_article(html)]
+    except Exception:
+        return None
+
+
+@ray.remote
+class Tokenizer:
+    """
+    Worker process holding a Mecab tagger, created once when the actor starts
+    With memo, {path, max_entries} of a tokencache.TokenCache shared by the workers, paragraphs are memoized
+    Statistics are kept per metrics directory of the calling crawl, as crawls of batch.py share the actors
+    """
+    def __init__(self, memo=None):
+        from konlpy.tag import Mecab
+        self.mecab = Mecab()
+        self.memo = TokenCache(**memo) if memo else None
+        self.totals = {}
+
+    def tokenize(self, batch, paragraphs=False, submitted=None, metrics_dir=None):
+        """
+        Turn a batch of (index, html or object ref of html) into [(index, nouns)]
+        nouns is None for articles whose fetch task failed or whose page could not be parsed
+        With paragraphs, each paragraph is tagged separately in the same call and the nouns are concatenated
+        Paragraphs are always tagged separately when memoized
+        submitted is the time the batch was sent, to measure how long it waited for this actor
+        metrics_dir is the metrics directory of the crawl the batch belongs to
+        """
+        metrics.use(metrics_dir)
+        if submitted:
+            metrics.observe('tokenize_wait', time.time() - submitted)
+        htmls = [html for _, html in batch]
+        refs = [i for i, html in enumerate(htmls) if isinstance(html, ray.ObjectRef)]
+        for i, html in zip(refs, fetched(htmls[i] for i in refs)):
+            htmls[i] = html
+        texts = [extract(html, paragraphs or self.memo) for html in htmls]
+
+        started = time.perf_counter()
+        docs = []
+        for (idx, _), doc in zip(batch, texts):
+            if doc is None:
+                docs.append((idx, None))
+                continue
+            with metrics.timer('tokenize'):
+                if self.memo:
+                    nouns = [word for words in self.memo.tokenize(self.mecab, doc) for word in words]
+                else:
+                    nouns = [word for text in doc for word in nouns_from_text(self.mecab, text)]
+            docs.append((idx, nouns))
+        totals = self.totals.setdefault(metrics_dir, dict(docs=0, tokens=0, seconds=0.0))
+        totals['seconds'] += time.perf_counter() - started
+        metrics.flush()
+        totals['docs'] += len(docs)
+        totals['tokens'] += sum(len(nouns) for _, nouns in docs if nouns is not None)
+        return docs
+
+    def stats(self, metrics_dir=None):
+        """
+        Statistics of the batches sent with metrics_dir
+        """
+        metrics.flush(force=True)
+        totals = self.totals.get(metrics_dir, dict(docs=0, tokens=0, seconds=0.0))
+        stats = dict(pid=os.getpid(), **totals,
+                     tokens_per_sec=totals['tokens'] / totals['seconds'] if totals['seconds'] else 0.0)
+        if self.memo:
+            stats.update(self.memo.stats())
+        return stats
+
+
+def start_tokenizers(n_workers=None, memo=None):
+    """
+    Start n_workers Tokenizer actors, number of cores - 1 by default
+    """
+    n_workers = n_workers or max(1, os.cpu_count() - 1)
+    return [Tokenizer.remote(memo) for _ in range(n_workers)]
+
+
+class TokenizerPool:
+    """
+    Batches articles and sends each full batch to the next Tokenizer actor in turn
+    actors are running Tokenizer actors to share, e.g. between the corpora of a batch, instead of starting new ones
+    At most max_batches batches(2 per actor by default) are in flight, so that pages waiting for Mecab do not
+    pile up in the object store
+    """
+    def __init__(self, n_workers=None, batch_size=64, paragraphs=False, memo=None, actors=None, max_batches=None):
+        self.actors = actors or start_tokenizers(n_workers, memo)
+        self.batch_size = batch_size
+        self.paragraphs = paragraphs
+        self.max_batches = max_batches or 2 * len(self.actors)
+        self.batch = []
+        self.refs = []
+        self.finished = []
+        self.n_sent = 0
+
+    def submit(self, idx, html):
+        self.batch.append((idx, html))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Send the current batch, first waiting for a batch to finish if max_batches are already in flight
+        """
+        if self.batch:
+            while len(self.refs) >= self.max_batches:
+                done, self.refs = ray.wait(self.refs)
+                self.finished += [doc for docs in ray.get(done) for doc in docs]
+            actor = self.actors[self.n_sent % len(self.actors)]
+            self.refs.append(actor.tokenize.remote(self.batch, self.paragraphs, time.time(), metrics.registry.dirname))
+            self.n_sent += 1
+            self.batch = []
+
+    def ready(self):
+        """
+        (index, nouns) of batches that are already finished
+        """
+        finished, self.finished = self.finished, []
+        if not self.refs:
+            return finished
+        done, self.refs = ray.wait(self.refs, num_returns=len(self.refs), timeout=0)
+        return finished + [doc for docs in ray.get(done) for doc in docs]
+
+    def drain(self):
+        """
+        (index, nouns) of every remaining article, as batches finish
+        """
+        self.flush()
+        yield from self.ready()
+        while self.refs:
+            done, self.refs = ray.wait(self.refs)
+            for docs in ray.get(done):
+                yield from docs
+
+    def stats(self):
+        """
+        Statistics of each actor for the articles of this pool's crawl
+        """
+        return ray.get([actor.stats.remote(metrics.registry.dirname) for actor in self.actors])
+
+
+def report(stats):
+    """
+    Print tokens/sec of each worker and of all workers together, and hit rate of the paragraph cache if any
+    """
+    for stat in stats:
+        print(f"    tokenizer {stat['pid']} : {stat['docs']} docs, {stat['tokens']} tokens, "
+              f"{stat['tokens_per_sec']:,.0f} tokens/s")
+    tokens = sum(stat['tokens'] for stat in stats)
+    seconds = max([stat['seconds'] for stat in stats] + [1e-9])
+    print(f">>> Tokenized {tokens} tokens with {len(stats)} workers : {tokens / seconds:,.0f} tokens/s")
+    if 'hits' in stats[0]:
+        hits = sum(stat['hits'] for stat in stats)
+        lookups = hits + sum(stat['misses'] for stat in stats)
+        saved = sum(stat['saved_seconds'] for stat in stats)
+        print(f">>> Paragraph cache : {hits} of {lookups} paragraphs hit({hits / max(lookups, 1):.1%}), "
+              f"{saved:.1f}s of Mecab CPU time saved")